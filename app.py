@@ -1,15 +1,31 @@
 import streamlit as st
 import sqlite3
 import os
-import bcrypt
 import stripe
 from datetime import datetime
 from PIL import Image
 
+import autenticacao
+import avaliacoes
+import cache
+import carrinho
+import catalogo
+import checkout
+import db
+import destaques
+import facetas
+import imagens
+import instrumentacao
+import pagamentos
+import pedidos
+import relatorios
+
 # --- CONFIGURAÇÕES INICIAIS ---
+perfil = instrumentacao.Perfil()
+perfil.marcar("inicializacao")
 stripe.api_key = os.getenv("STRIPE_API_KEY", "sua_chave_aqui")
 st.set_page_config(page_title="E-commerce Completo", layout="wide")
-IMAGES_DIR = "images"
+IMAGES_DIR = imagens.IMAGES_DIR
 os.makedirs(IMAGES_DIR, exist_ok=True)
 
 # --- INJEÇÃO DE CSS ---
@@ -24,90 +40,80 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- CONEXÃO COM BANCO DE DADOS ---
-conn = sqlite3.connect('ecommerce.db')
-cursor = conn.cursor()
+@st.cache_resource
+def obter_banco():
+    # Uma única instância por processo: schema criado só uma vez
+    return db.GerenciadorConexoes(db.DB_PATH)
+
+
+@st.cache_resource
+def obter_cache():
+    # Cache de consultas compartilhado por todas as sessões do processo;
+    # um novo snapshot de leitura invalida o que foi lido do anterior
+    consultas = cache.CacheConsultas()
+    obter_banco().ao_renovar.append(lambda: consultas.invalidar("produtos", "vendas", "categorias"))
+    return consultas
+
+
+@st.cache_resource
+def obter_processador_pagamentos():
+    # Drena a fila de pagamentos em segundo plano durante a vida do processo
+    obter_banco()  # garante as migrações antes da primeira varredura
+    return pagamentos.ProcessadorPagamentos(db.DB_PATH).iniciar()
+
+
+@st.cache_resource
+def obter_autenticacao():
+    # Pool de bcrypt e sessões verificadas compartilhados pelo processo
+    return autenticacao.ServicoAutenticacao()
+
+
+@st.cache_resource
+def obter_carrinhos():
+    # Carrinhos em memória, gravados em lote no SQLite por uma thread
+    banco = obter_banco()
+    return carrinho.ServicoCarrinho(banco.conexao).iniciar()
+
+
+@st.cache_resource
+def obter_estatisticas():
+    # Tempos por seção e por consulta acumulados de todas as execuções
+    return instrumentacao.EstatisticasProcesso()
 
-# --- CRIAÇÃO DE TABELAS E MIGRAÇÕES ---
-cursor.executescript('''
-    CREATE TABLE IF NOT EXISTS usuarios (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        senha_hash TEXT NOT NULL,
-        is_admin INTEGER DEFAULT 0
-    );
-
-    CREATE TABLE IF NOT EXISTS categorias (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT UNIQUE NOT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS produtos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL,
-        descricao TEXT,
-        preco REAL,
-        imagem_url TEXT,
-        categoria_id INTEGER,
-        media_avaliacoes REAL DEFAULT 0,
-        total_avaliacoes INTEGER DEFAULT 0,
-        preco_promocional REAL DEFAULT 0,
-        FOREIGN KEY(categoria_id) REFERENCES categorias(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS carrinho (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        usuario_id INTEGER,
-        produto_id INTEGER,
-        quantidade INTEGER DEFAULT 1,
-        data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(usuario_id) REFERENCES usuarios(id),
-        FOREIGN KEY(produto_id) REFERENCES produtos(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS pedidos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        usuario_id INTEGER,
-        data_pedido DATETIME DEFAULT CURRENT_TIMESTAMP,
-        total REAL,
-        status TEXT DEFAULT 'pendente',
-        payment_intent TEXT,
-        FOREIGN KEY(usuario_id) REFERENCES usuarios(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS itens_pedido (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        pedido_id INTEGER,
-        produto_id INTEGER,
-        quantidade INTEGER,
-        preco_unitario REAL,
-        FOREIGN KEY(pedido_id) REFERENCES pedidos(id)
-    );
-
-    CREATE TABLE IF NOT EXISTS avaliacoes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        usuario_id INTEGER,
-        produto_id INTEGER,
-        nota INTEGER,
-        comentario TEXT,
-        data_avaliacao DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY(usuario_id) REFERENCES usuarios(id),
-        FOREIGN KEY(produto_id) REFERENCES produtos(id)
-    );
-''')
-
-# Migrações (executa apenas se a coluna não existir)
-try:
-    cursor.execute("ALTER TABLE produtos ADD COLUMN preco_promocional REAL DEFAULT 0")
-except sqlite3.OperationalError:
-    pass  # Coluna já existe
-
-# Popula dados de exemplo (apague em produção)
-cursor.execute('''
-    INSERT OR IGNORE INTO produtos (nome, descricao, preco, preco_promocional)
-    VALUES ('Smartphone X', 'Celular de última geração', 1999.99, 1799.99)
-''')
-conn.commit()
+
+@st.cache_resource
+def obter_facetas():
+    # Índice de facetas compartilhado; construído uma vez, depois só incremental
+    indice = facetas.IndiceFacetas()
+    indice.reconstruir(obter_banco().leitura())
+    return indice
+
+
+banco = obter_banco()
+
+
+def conexoes():
+    """Conexões de escrita e de leitura da thread atual.
+
+    Reruns de fragmento rodam em outra thread, então cada fragmento pede as
+    suas em vez de usar as do script. As leituras de navegação ficam
+    separadas das escritas conforme ECOMMERCE_LEITURA.
+    """
+    conn, leitura = banco.conexao(), banco.leitura()
+    if instrumentacao.ATIVA:
+        conn = instrumentacao.ConexaoInstrumentada(conn, perfil)
+        leitura = instrumentacao.ConexaoInstrumentada(leitura, perfil)
+    return conn, leitura
+
+
+conn, leitura = conexoes()
+cursor = conn.cursor()
+cursor_leitura = leitura.cursor()
+consultas = obter_cache()
+obter_processador_pagamentos()
+auth = obter_autenticacao()
+carrinhos = obter_carrinhos()
+estatisticas = obter_estatisticas()
 
 # --- INICIALIZAÇÃO DE ESTADO ---
 if 'user' not in st.session_state:
@@ -115,13 +121,28 @@ if 'user' not in st.session_state:
 if 'page' not in st.session_state:
     st.session_state.page = 1
 
+
+def trocar_usuario(user, token=None):
+    """Troca o usuário da sessão e descarta o estado que era do anterior."""
+    st.session_state.user = user
+    st.session_state.token = token
+    # As chaves de paginação do histórico apontam para pedidos do usuário anterior
+    st.session_state.pop('pedidos_cursores', None)
+
+
+# Sessão verificada: o token é conferido em memória a cada rerun, sem bcrypt
+if st.session_state.user and not auth.sessao(st.session_state.get('token')):
+    trocar_usuario(None)
+
 # --- AUTENTICAÇÃO ---
+perfil.marcar("autenticacao")
 with st.sidebar:
     st.header("🔐 Autenticação")
     if st.session_state.user:
         st.write(f"Logado como: **{st.session_state.user['email']}**")
         if st.button("Logout"):
-            st.session_state.user = None
+            auth.encerrar_sessao(st.session_state.get('token'))
+            trocar_usuario(None)
             st.rerun()
     else:
         auth_option = st.selectbox("Escolha uma opção", ["Login", "Registrar"])
@@ -130,28 +151,20 @@ with st.sidebar:
             email = st.text_input("Email")
             senha = st.text_input("Senha", type="password")
             if st.button("Entrar"):
-                user = cursor.execute(
-                    "SELECT * FROM usuarios WHERE email = ?",
-                    (email,)
-                ).fetchone()
-
-                # Correção: Garantir que a senha_hash seja bytes
-                if user:
-                    senha_hash = user[3]
-                    if isinstance(senha_hash, str):
-                        senha_hash = senha_hash.encode()
-
-                    if bcrypt.checkpw(senha.encode(), senha_hash):
-                        st.session_state.user = {
+                try:
+                    user = auth.autenticar(conn, email, senha)
+                    if user:
+                        usuario = {
                             "id": user[0],
                             "email": user[2],
                             "is_admin": user[4]
                         }
+                        trocar_usuario(usuario, auth.abrir_sessao(usuario))
                         st.rerun()
                     else:
                         st.error("Usuário ou senha inválidos")
-                else:
-                    st.error("Usuário ou senha inválidos")
+                except autenticacao.Sobrecarregado:
+                    st.warning("Muitos acessos no momento. Tente novamente em alguns segundos.")
 
         elif auth_option == "Registrar":
             nome = st.text_input("Nome Completo")
@@ -162,15 +175,16 @@ with st.sidebar:
                 if senha != confirmar_senha:
                     st.error("Senhas não coincidem")
                 else:
-                    # Correção: Garantir que a senha seja bytes
-                    senha_hash = bcrypt.hashpw(senha.encode(), bcrypt.gensalt())
                     try:
+                        senha_hash = auth.gerar_hash(senha)
                         cursor.execute(
                             "INSERT INTO usuarios (nome, email, senha_hash) VALUES (?, ?, ?)",
                             (nome, email, senha_hash)
                         )
                         conn.commit()
                         st.success("Usuário registrado com sucesso!")
+                    except autenticacao.Sobrecarregado:
+                        st.warning("Muitos acessos no momento. Tente novamente em alguns segundos.")
                     except sqlite3.IntegrityError:
                         st.error("Email já cadastrado")
 
@@ -178,7 +192,9 @@ with st.sidebar:
 st.markdown("<h1 class='title'>🛒 E-commerce Completo</h1>", unsafe_allow_html=True)
 
 # --- SEÇÃO DE ADMINISTRAÇÃO ---
+perfil.marcar("admin")
 if st.session_state.user and st.session_state.user['is_admin']:
+    # Expansores com estado: o conteúdo só é montado (e consultado) quando aberto
     with st.expander("ADMIN: Gerenciar Categorias"):
         with st.form("categoria_form"):
             nome_categoria = st.text_input("Nova Categoria")
@@ -189,276 +205,418 @@ if st.session_state.user and st.session_state.user['is_admin']:
                         (nome_categoria,)
                     )
                     conn.commit()
+                    consultas.invalidar("categorias")
                     st.success("Categoria adicionada!")
                 except sqlite3.IntegrityError:
                     st.error("Categoria já existe")
 
+    painel_desempenho = st.expander("ADMIN: Desempenho", key="admin_desempenho", on_change="rerun")
+    if painel_desempenho.open:
+        with painel_desempenho:
+            ultimo = st.session_state.get('ultimo_perfil')
+            if ultimo:
+                st.write(f"**Última execução:** {ultimo['total_ms']:.1f} ms")
+                st.json(ultimo['secoes_ms'])
+                for sql in ultimo['possiveis_n_mais_1']:
+                    st.warning(f"Possível N+1: {sql}")
+                st.dataframe(ultimo['consultas'])
+            resumo = estatisticas.resumo()
+            st.write(f"**Acumulado do processo:** {resumo['execucoes']} execuções (média por seção, ms)")
+            st.json(resumo['secoes_media_ms'])
+            st.dataframe(resumo['consultas'])
+
+    painel_cache = st.expander("ADMIN: Cache de Consultas", key="admin_cache", on_change="rerun")
+    if painel_cache.open:
+        with painel_cache:
+            st.json(consultas.estatisticas())
+            if st.button("Limpar cache"):
+                consultas.limpar()
+                st.rerun()
+
+    painel_relatorios = st.expander("ADMIN: Relatórios de Vendas", key="admin_relatorios", on_change="rerun")
+    if painel_relatorios.open:
+        with painel_relatorios:
+            col_periodo, col_metrica, col_por = st.columns([2, 1, 1])
+            periodo = col_periodo.date_input("Período (UTC)", value=relatorios.periodo_padrao())
+            metrica = col_metrica.selectbox("Métrica", relatorios.METRICAS)
+            por = col_por.selectbox("Agrupar por", list(relatorios.AGRUPAMENTOS))
+            if len(periodo) == 2:
+                inicio, fim = periodo
+                st.line_chart(consultas.obter(
+                    ("relatorio", "serie", inicio, fim, metrica),
+                    lambda: relatorios.serie_temporal(cursor_leitura, inicio, fim, metrica),
+                    tags=("vendas",)
+                ))
+                st.write(f"**Top 10 por {metrica}**")
+                st.dataframe(consultas.obter(
+                    ("relatorio", "top", inicio, fim, por, metrica),
+                    lambda: relatorios.top_n(cursor_leitura, inicio, fim, 10, por, metrica),
+                    tags=("vendas",)
+                ))
+                st.write("**Comparação com o período anterior**")
+                comparacao = consultas.obter(
+                    ("relatorio", "comparar", inicio, fim, por, metrica),
+                    lambda: relatorios.comparar_periodos(cursor_leitura, inicio, fim, por, metrica),
+                    tags=("vendas",)
+                )
+                st.dataframe(comparacao)
+                st.download_button(
+                    "Baixar comparação (CSV)",
+                    comparacao.to_csv().encode("utf-8"),
+                    file_name=f"comparacao_{por}_{inicio}_{fim}.csv",
+                    mime="text/csv",
+                )
+                st.caption("Exportação completa do rollup: `python relatorios.py exportar vendas.parquet`")
+
 # --- SEÇÃO DE PRODUTOS ---
 st.markdown("## 🛍️ Produtos Disponíveis")
 
 # --- FILTROS ---
+perfil.marcar("filtros")
 with st.sidebar:
     st.header("🔍 Filtros")
     search_term = st.text_input("Buscar por nome")
+    min_price = st.number_input("Preço Mínimo", value=0.0)
+    max_price = st.number_input("Preço Máximo", value=10000.0)
+
+    categorias = consultas.obter(
+        "categorias",
+        lambda: cursor_leitura.execute("SELECT id, nome FROM categorias").fetchall(),
+        ttl=300, tags=("categorias",)
+    )
+    ids_categoria = {nome: id_ for id_, nome in categorias}
+
+    # Contagens das facetas a partir do índice em memória (só aplica o log de alterações)
+    indice_facetas = obter_facetas()
+    perfil.medir("facetas", indice_facetas.atualizar, leitura)
+    perfil.medir("facetas", indice_facetas.podar, conn)
+    busca = catalogo.expressao_busca(search_term)
+    ids_busca = consultas.obter(
+        ("ids_busca", busca),
+        lambda: facetas.ids_da_busca(cursor_leitura, busca),
+        ttl=facetas.TTL_BUSCA, tags=("produtos",)
+    ) if busca else None
+    categoria_atual = st.session_state.get("categoria_filtro", "Todas")
+    por_categoria, por_faixa = indice_facetas.contar(
+        min_price, max_price, ids_categoria.get(categoria_atual), ids_busca
+    )
+
     categoria_filtro = st.selectbox(
         "Filtrar por Categoria",
-        ["Todas"] + [c[0] for c in cursor.execute("SELECT nome FROM categorias").fetchall()]
+        ["Todas"] + [nome for _, nome in categorias],
+        key="categoria_filtro",
+        format_func=lambda nome: (
+            f"Todas ({sum(por_categoria.values())})" if nome == "Todas"
+            else f"{nome} ({por_categoria.get(ids_categoria[nome], 0)})"
+        ),
     )
-    min_price = st.number_input("Preço Mínimo", value=0.0)
-    max_price = st.number_input("Preço Máximo", value=10000.0)
+    st.caption("Faixas de preço: " + " · ".join(
+        f"R$ {inicio:.0f}+ ({qtd})" if fim == float("inf") else f"R$ {inicio:.0f}–{fim:.0f} ({qtd})"
+        for inicio, fim, qtd in por_faixa if qtd
+    ))
 
     # Correção: Usar session_state para persistir a página
     page = st.number_input("Página", min_value=1, step=1, value=st.session_state.page)
     st.session_state.page = page
 
 # --- APLICAR FILTROS ---
-query = """
-    SELECT p.*, c.nome as categoria
-    FROM produtos p
-    LEFT JOIN categorias c ON p.categoria_id = c.id
-    WHERE p.preco BETWEEN ? AND ?
-"""
-params = [min_price, max_price]
-
-if search_term:
-    query += " AND p.nome LIKE ?"
-    params.append(f"%{search_term}%")
-
-if categoria_filtro != "Todas":
-    query += " AND c.nome = ?"
-    params.append(categoria_filtro)
-
-produtos = cursor.execute(query, params).fetchall()
-total_pages = max((len(produtos) // 5) + (1 if len(produtos) % 5 > 0 else 0), 1)
-page = min(max(page, 1), total_pages)
-produtos_pagina = produtos[(page-1)*5 : page*5]
+perfil.marcar("catalogo")
+filtros = catalogo.Filtros(min_price, max_price, search_term, categoria_filtro)
+
+# Correção: Reiniciar as chaves de paginação quando os filtros mudam
+if st.session_state.get('filtros') != filtros:
+    st.session_state.filtros = filtros
+    st.session_state.cursores = {1: None}
+
+
+# Cada seção abaixo é um fragmento: um clique dentro dela reexecuta só a
+# própria seção. Mudar filtros, login ou página reexecuta o script inteiro.
 
 # --- EXIBIÇÃO DE PRODUTOS ---
-for produto in produtos_pagina:
-    with st.container():
-        st.markdown(f"<div class='product-card'>", unsafe_allow_html=True)
-        col1, col2, col3 = st.columns([1, 3, 2])
-
-        # Coluna da imagem
-        with col1:
-            # Correção: Melhor tratamento para imagens ausentes
-            if produto[4] and os.path.exists(produto[4]):
-                st.image(produto[4], width=150)
-            else:
-                st.write("Sem imagem")
-
-        # Coluna das informações
-        with col2:
-            st.markdown(f"**{produto[1]}**")
-            st.markdown(f"**Preço:** R$ {produto[3]:,.2f}")
-            if produto[8] > 0:
-                st.markdown(f"🔥 Promo: R$ {produto[8]:,.2f}")
-            st.markdown(f"**Descrição:** {produto[2]}")
-            st.markdown(f"**Categoria:** {produto[9] or 'Sem categoria'}")
-
-        # Coluna do carrinho
-        with col3:
-            if st.session_state.user:
-                quantidade = st.number_input(
-                    f"Quantidade ({produto[1]})",
-                    min_value=1,
-                    max_value=10,
-                    value=1,
-                    key=f"qtd_{produto[0]}"
-                )
-                if st.button(f"🛒 Adicionar ao Carrinho ({produto[1]})", key=f"add_{produto[0]}"):
-                    cursor.execute(
-                        "INSERT INTO carrinho (usuario_id, produto_id, quantidade) VALUES (?, ?, ?)",
-                        (st.session_state.user['id'], produto[0], quantidade)
+@st.fragment
+def secao_catalogo(filtros, page):
+    _, leitura = conexoes()
+    cursor_leitura = leitura.cursor()
+
+    total_produtos = consultas.obter(
+        ("contagem", filtros),
+        lambda: catalogo.contar_produtos(cursor_leitura, filtros),
+        tags=("produtos",)
+    )
+    total_pages = catalogo.total_paginas(total_produtos)
+    page = min(max(page, 1), total_pages)
+    produtos_pagina = consultas.obter(
+        ("pagina", filtros, page, st.session_state.cursores.get(page, "offset")),
+        lambda: catalogo.buscar_pagina_numero(cursor_leitura, filtros, page, st.session_state.cursores),
+        tags=("produtos",)
+    )
+    catalogo.registrar_cursor(filtros, page, produtos_pagina, st.session_state.cursores)
+
+    for produto in produtos_pagina:
+        with st.container():
+            st.markdown(f"<div class='product-card'>", unsafe_allow_html=True)
+            col1, col2, col3 = st.columns([1, 3, 2])
+
+            # Coluna da imagem
+            with col1:
+                # Correção: Melhor tratamento para imagens ausentes
+                miniatura = perfil.medir("imagens", imagens.miniatura, produto[4], 150)
+                if miniatura:
+                    st.image(miniatura, width=150)
+                else:
+                    st.write("Sem imagem")
+
+            # Coluna das informações
+            with col2:
+                st.markdown(f"**{produto[1]}**")
+                st.markdown(f"**Preço:** R$ {produto[3]:,.2f}")
+                if produto[8] > 0:
+                    st.markdown(f"🔥 Promo: R$ {produto[8]:,.2f}")
+                st.markdown(f"**Descrição:** {produto[2]}")
+                st.markdown(f"**Categoria:** {produto[9] or 'Sem categoria'}")
+
+            # Coluna do carrinho
+            with col3:
+                if st.session_state.user:
+                    quantidade = st.number_input(
+                        f"Quantidade ({produto[1]})",
+                        min_value=1,
+                        max_value=10,
+                        value=1,
+                        key=f"qtd_{produto[0]}"
                     )
-                    conn.commit()
-                    st.success(f"{quantidade}x {produto[1]} adicionado(s) ao carrinho!")
+                    if st.button(f"🛒 Adicionar ao Carrinho ({produto[1]})", key=f"add_{produto[0]}"):
+                        carrinhos.adicionar(st.session_state.user['id'], produto[0], quantidade)
+                        aviso = f"{quantidade}x {produto[1]} adicionado(s) ao carrinho!"
+                        if st.session_state.get('painel_carrinho'):
+                            # Carrinho aberto: reexecuta a página para ele mostrar o item novo
+                            st.session_state.aviso_carrinho = (produto[0], aviso)
+                            st.rerun()
+                        st.success(aviso)
+                    elif st.session_state.get('aviso_carrinho', (None,))[0] == produto[0]:
+                        st.success(st.session_state.pop('aviso_carrinho')[1])
+
+            st.markdown("</div>", unsafe_allow_html=True)
+            st.write("---")
+
+    # --- CONTROLES DE PAGINAÇÃO ---
+    # Reexecuta o script inteiro para manter o campo "Página" da barra lateral em sincronia
+    st.write(f"Página {page} de {total_pages}")
+    prev, _, next_ = st.columns([1, 10, 1])
+    if prev.button("← Anterior") and page > 1:
+        st.session_state.page = page - 1
+        st.rerun()
+    if next_.button("Próximo →") and page < total_pages:
+        st.session_state.page = page + 1
+        st.rerun()
+
+
+secao_catalogo(filtros, page)
 
-        st.markdown("</div>", unsafe_allow_html=True)
-        st.write("---")
 
 # --- SEÇÃO DE DESTAQUES ---
-st.markdown("## 🏆 Destaques")
-tabs = st.tabs(["🔥 Mais Vendidos", "⭐ Melhores Avaliados", "💰 Melhores Preços", "🎁 Promoções"])
-
-# --- MAIS VENDIDOS ---
-with tabs[0]:
-    mais_vendidos = cursor.execute("""
-        SELECT p.*, SUM(i.quantidade) as total_vendido
-        FROM produtos p
-        JOIN itens_pedido i ON p.id = i.produto_id
-        GROUP BY p.id
-        ORDER BY total_vendido DESC
-        LIMIT 5
-    """).fetchall()
-
-    if mais_vendidos:
-        for produto in mais_vendidos:
-            with st.container():
-                col1, col2 = st.columns([1, 3])
-                with col1:
-                    if produto[4] and os.path.exists(produto[4]):
-                        st.image(produto[4], width=100)
-                    else:
-                        st.write("Sem imagem")
-                with col2:
-                    st.write(f"**{produto[1]}**")
-                    st.write(f"Vendidos: {produto[10]:,}")
-                    st.write(f"Preço: R$ {produto[3]:,.2f}")
-    else:
-        st.write("Ainda não há produtos vendidos.")
-
-# --- MELHORES AVALIADOS ---
-with tabs[1]:
-    melhores_avaliados = cursor.execute("""
-        SELECT *, (media_avaliacoes * 20) as porcentagem
-        FROM produtos
-        WHERE total_avaliacoes >= 5
-        ORDER BY media_avaliacoes DESC
-        LIMIT 5
-    """).fetchall()
-
-    if melhores_avaliados:
-        for produto in melhores_avaliados:
-            with st.container():
-                col1, col2 = st.columns([1, 3])
-                with col1:
-                    if produto[4] and os.path.exists(produto[4]):
-                        st.image(produto[4], width=100)
-                    else:
-                        st.write("Sem imagem")
-                with col2:
-                    st.write(f"**{produto[1]}**")
-                    st.write(f"⭐ {produto[6]:.1f}/5 ({produto[7]} avaliações)")
-                    st.progress(int(produto[10]))
-                    st.write(f"Preço: R$ {produto[3]:,.2f}")
-    else:
-        st.write("Ainda não há produtos avaliados.")
-
-# --- MELHORES PREÇOS ---
-with tabs[2]:
-    melhores_precos = cursor.execute("""
-        SELECT * FROM produtos
-        WHERE preco > 0
-        ORDER BY preco ASC
-        LIMIT 5
-    """).fetchall()
-
-    if melhores_precos:
-        for produto in melhores_precos:
-            with st.container():
-                col1, col2 = st.columns([1, 3])
-                with col1:
-                    if produto[4] and os.path.exists(produto[4]):
-                        st.image(produto[4], width=100)
-                    else:
-                        st.write("Sem imagem")
-                with col2:
-                    st.write(f"**{produto[1]}**")
-                    st.write(f"Preço: R$ {produto[3]:,.2f}")
-    else:
-        st.write("Não há produtos cadastrados.")
-
-# --- PROMOÇÕES ---
-with tabs[3]:
-    promocoes = cursor.execute("""
-        SELECT * FROM produtos
-        WHERE preco_promocional > 0 AND preco_promocional < preco
-        ORDER BY (preco - preco_promocional) DESC
-        LIMIT 5
-    """).fetchall()
-
-    if promocoes:
-        for produto in promocoes:
-            with st.container():
-                col1, col2 = st.columns([1, 3])
-                with col1:
-                    if produto[4] and os.path.exists(produto[4]):
-                        st.image(produto[4], width=100)
-                    else:
-                        st.write("Sem imagem")
-                with col2:
-                    st.write(f"**{produto[1]}**")
-                    st.write(f"Normal: ~~R$ {produto[3]:,.2f}~~")
-                    st.write(f"🔥 Promo: R$ {produto[8]:,.2f}")
-                    desconto = 100 - (produto[8]/produto[3])*100
-                    st.write(f"DESCONTO DE {desconto:.0f}%")
-    else:
-        st.write("Não há promoções ativas.")
+@st.fragment
+def secao_destaques():
+    _, leitura = conexoes()
+    cursor_leitura = leitura.cursor()
+
+    # Abas com estado: só a aba aberta consulta o banco
+    tabs = st.tabs(
+        ["🔥 Mais Vendidos", "⭐ Melhores Avaliados", "💰 Melhores Preços", "🎁 Promoções"],
+        key="aba_destaques", on_change="rerun"
+    )
+
+    # --- MAIS VENDIDOS ---
+    if tabs[0].open:
+        with tabs[0]:
+            mais_vendidos = consultas.obter(
+                ("destaques", "mais_vendidos"),
+                lambda: destaques.buscar(cursor_leitura, "mais_vendidos"),
+                tags=("vendas",)
+            )
+
+            if mais_vendidos:
+                for produto in mais_vendidos:
+                    with st.container():
+                        col1, col2 = st.columns([1, 3])
+                        with col1:
+                            miniatura = perfil.medir("imagens", imagens.miniatura, produto[4], 100)
+                            if miniatura:
+                                st.image(miniatura, width=100)
+                            else:
+                                st.write("Sem imagem")
+                        with col2:
+                            st.write(f"**{produto[1]}**")
+                            st.write(f"Vendidos: {produto[9]:,}")
+                            st.write(f"Preço: R$ {produto[3]:,.2f}")
+            else:
+                st.write("Ainda não há produtos vendidos.")
+
+    # --- MELHORES AVALIADOS ---
+    if tabs[1].open:
+        with tabs[1]:
+            melhores_avaliados = consultas.obter(
+                ("destaques", "melhores_avaliados"),
+                lambda: destaques.buscar(cursor_leitura, "melhores_avaliados"),
+                tags=("produtos",)
+            )
+
+            if melhores_avaliados:
+                for produto in melhores_avaliados:
+                    with st.container():
+                        col1, col2 = st.columns([1, 3])
+                        with col1:
+                            miniatura = perfil.medir("imagens", imagens.miniatura, produto[4], 100)
+                            if miniatura:
+                                st.image(miniatura, width=100)
+                            else:
+                                st.write("Sem imagem")
+                        with col2:
+                            st.write(f"**{produto[1]}**")
+                            st.write(f"⭐ {produto[6]:.1f}/5 ({produto[7]} avaliações)")
+                            st.progress(int(produto[9]))
+                            st.write(f"Preço: R$ {produto[3]:,.2f}")
+            else:
+                st.write("Ainda não há produtos avaliados.")
+
+    # --- MELHORES PREÇOS ---
+    if tabs[2].open:
+        with tabs[2]:
+            melhores_precos = consultas.obter(
+                ("destaques", "melhores_precos"),
+                lambda: destaques.buscar(cursor_leitura, "melhores_precos"),
+                tags=("produtos",)
+            )
+
+            if melhores_precos:
+                for produto in melhores_precos:
+                    with st.container():
+                        col1, col2 = st.columns([1, 3])
+                        with col1:
+                            miniatura = perfil.medir("imagens", imagens.miniatura, produto[4], 100)
+                            if miniatura:
+                                st.image(miniatura, width=100)
+                            else:
+                                st.write("Sem imagem")
+                        with col2:
+                            st.write(f"**{produto[1]}**")
+                            st.write(f"Preço: R$ {produto[3]:,.2f}")
+            else:
+                st.write("Não há produtos cadastrados.")
+
+    # --- PROMOÇÕES ---
+    if tabs[3].open:
+        with tabs[3]:
+            promocoes = consultas.obter(
+                ("destaques", "promocoes"),
+                lambda: destaques.buscar(cursor_leitura, "promocoes"),
+                tags=("produtos",)
+            )
+
+            if promocoes:
+                for produto in promocoes:
+                    with st.container():
+                        col1, col2 = st.columns([1, 3])
+                        with col1:
+                            miniatura = perfil.medir("imagens", imagens.miniatura, produto[4], 100)
+                            if miniatura:
+                                st.image(miniatura, width=100)
+                            else:
+                                st.write("Sem imagem")
+                        with col2:
+                            st.write(f"**{produto[1]}**")
+                            st.write(f"Normal: ~~R$ {produto[3]:,.2f}~~")
+                            st.write(f"🔥 Promo: R$ {produto[8]:,.2f}")
+                            desconto = 100 - (produto[8]/produto[3])*100
+                            st.write(f"DESCONTO DE {desconto:.0f}%")
+            else:
+                st.write("Não há promoções ativas.")
 
+
+perfil.marcar("destaques")
+st.markdown("## 🏆 Destaques")
+secao_destaques()
 # --- SEÇÃO DE CARRINHO ---
-if st.session_state.user:
-    with st.expander("🛒 Meu Carrinho"):
-        carrinho_itens = cursor.execute(
-            """
-            SELECT c.id, p.id as produto_id, p.nome, p.preco, c.quantidade, p.imagem_url
-            FROM carrinho c
-            JOIN produtos p ON c.produto_id = p.id
-            WHERE c.usuario_id = ?
-            """,
-            (st.session_state.user['id'],)
-        ).fetchall()
-
-        total = sum(item[3] * item[4] for item in carrinho_itens)
+@st.fragment
+def secao_carrinho():
+    conn, _ = conexoes()
+    painel = st.expander("🛒 Meu Carrinho", key="painel_carrinho", on_change="rerun")
+    if not painel.open:
+        return
+    with painel:
+        pedido = st.session_state.pop('ultimo_pedido', None)
+        if pedido:
+            if pedido.novo:
+                st.success(f"Pedido #{pedido.id} criado com sucesso!")
+            else:
+                st.info(f"Pedido #{pedido.id} já havia sido criado.")
+
+            # O intent é gerado em segundo plano; o link aparece em "Meus Pedidos"
+            if pedido.payment_intent:
+                st.markdown(f"[Clique aqui para pagar](https://checkout.stripe.com/c/pay/{pedido.payment_intent})")
+            else:
+                st.info("Estamos preparando seu pagamento. O link aparecerá em \"Meus Pedidos\" em instantes.")
+
+        usuario_id = st.session_state.user['id']
+        carrinho_itens = carrinhos.itens(usuario_id)
+        total = sum(item.preco * item.quantidade for item in carrinho_itens)
 
         if carrinho_itens:
             st.write(f"**Total: R$ {total:,.2f}**")
 
             # Exibir itens do carrinho
             for item in carrinho_itens:
-                st.write(f"- {item[2]} ({item[4]}x) - R$ {item[3]:,.2f}")
-                if st.button(f"Remover {item[2]}", key=f"rem_{item[0]}"):
-                    cursor.execute("DELETE FROM carrinho WHERE id = ?", (item[0],))
-                    conn.commit()
-                    st.rerun()
+                st.write(f"- {item.nome} ({item.quantidade}x) - R$ {item.preco:,.2f}")
+                if st.button(f"Remover {item.nome}", key=f"rem_{item.produto_id}"):
+                    carrinhos.remover(usuario_id, item.produto_id)
+                    st.rerun(scope="fragment")
 
             # Correção: Melhor tratamento para pagamento
             if st.button("Finalizar Compra"):
                 try:
-                    # Criar intent de pagamento
-                    intent = stripe.PaymentIntent.create(
-                        amount=int(total * 100),
-                        currency='brl',
-                        payment_method_types=['card'],
-                        description=f"Pedido de {st.session_state.user['email']}"
-                    )
-
-                    # Criar pedido
-                    cursor.execute(
-                        "INSERT INTO pedidos (usuario_id, total, payment_intent, status) VALUES (?, ?, ?, ?)",
-                        (st.session_state.user['id'], total, intent['id'], 'aguardando_pagamento')
+                    # Grava as alterações pendentes do carrinho antes de ler o banco
+                    carrinhos.descarregar(usuario_id)
+                    pedido = checkout.finalizar_compra(
+                        conn, usuario_id, f"Pedido de {st.session_state.user['email']}"
                     )
-                    pedido_id = cursor.lastrowid
+                    carrinhos.esquecer(usuario_id)
+                    consultas.invalidar("vendas")
 
-                    # Adicionar itens ao pedido
-                    for item in carrinho_itens:
-                        cursor.execute(
-                            "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)",
-                            (pedido_id, item[1], item[4], item[3])  # Correção: Usar produto_id
-                        )
-
-                    # Limpar carrinho
-                    cursor.execute(
-                        "DELETE FROM carrinho WHERE usuario_id = ?",
-                        (st.session_state.user['id'],)
-                    )
-                    conn.commit()
-
-                    # Correção: Usar link para Stripe em vez de JavaScript
-                    st.success(f"Pedido #{pedido_id} criado com sucesso!")
-                    st.markdown(f"[Clique aqui para pagar](https://checkout.stripe.com/c/pay/{intent['id']})")
+                    # Reexecuta a página inteira para esvaziar o carrinho e mostrar o
+                    # pedido em "Meus Pedidos" (a partir da página mais recente)
+                    st.session_state.ultimo_pedido = pedido
+                    st.session_state.pop('pedidos_cursores', None)
+                    st.rerun()
 
+                except checkout.CarrinhoAlterado:
+                    carrinhos.esquecer(usuario_id)
+                    st.warning("Seu carrinho mudou durante a finalização. Confira e tente novamente.")
                 except Exception as e:
                     st.error(f"Erro no processamento: {str(e)}")
         else:
             st.write("Seu carrinho está vazio")
 
+
 # --- SEÇÃO DE AVALIAÇÕES ---
-if st.session_state.user:
-    with st.expander("⭐ Avaliar Produto"):
-        produtos = cursor.execute("SELECT id, nome FROM produtos").fetchall()
+@st.fragment
+def secao_avaliacoes():
+    painel = st.expander("⭐ Avaliar Produto", key="painel_avaliacoes", on_change="rerun")
+    if not painel.open:
+        return
+    conn, leitura = conexoes()
+    cursor = conn.cursor()
+    cursor_leitura = leitura.cursor()
+    with painel:
+        produtos = consultas.obter(
+            "produtos_avaliacao",
+            lambda: cursor_leitura.execute("SELECT id, nome FROM produtos").fetchall(),
+            ttl=300, tags=("produtos",)
+        )
         if produtos:
             produto_selecionado = st.selectbox("Selecione um produto", produtos, format_func=lambda x: x[1])
+            estrelas = avaliacoes.histograma(cursor_leitura, produto_selecionado[0])
+            if sum(estrelas):
+                st.caption(" | ".join(f"{n}★: {qtd}" for n, qtd in zip(range(5, 0, -1), reversed(estrelas))))
             nota = st.slider("Nota", 1, 5)
             comentario = st.text_area("Comentário")
 
@@ -488,30 +646,31 @@ if st.session_state.user:
                         "INSERT INTO avaliacoes (usuario_id, produto_id, nota, comentario) VALUES (?, ?, ?, ?)",
                         (st.session_state.user['id'], produto_selecionado[0], nota, comentario)
                     )
-                    cursor.execute(
-                        """
-                        UPDATE produtos
-                        SET media_avaliacoes = (SELECT AVG(nota) FROM avaliacoes WHERE produto_id = ?),
-                            total_avaliacoes = (SELECT COUNT(*) FROM avaliacoes WHERE produto_id = ?)
-                        WHERE id = ?
-                        """,
-                        (produto_selecionado[0], produto_selecionado[0], produto_selecionado[0])
-                    )
+                    # Média e total do produto são atualizados por trigger na mesma transação
                     conn.commit()
+                    consultas.invalidar("produtos")
                     st.success("Avaliação registrada!")
         else:
             st.write("Não há produtos para avaliar")
 
+
 # --- SEÇÃO DE HISTÓRICO DE PEDIDOS ---
-if st.session_state.user:
-    with st.expander("📜 Meus Pedidos"):
-        pedidos = cursor.execute(
-            "SELECT * FROM pedidos WHERE usuario_id = ? ORDER BY data_pedido DESC",
-            (st.session_state.user['id'],)
-        ).fetchall()
-
-        if pedidos:
-            for pedido in pedidos:
+@st.fragment
+def secao_pedidos():
+    painel = st.expander("📜 Meus Pedidos", key="painel_pedidos", on_change="rerun")
+    if not painel.open:
+        return
+    conn, _ = conexoes()
+    with painel:
+        # Pilha com a chave de início de cada página já visitada
+        if 'pedidos_cursores' not in st.session_state:
+            st.session_state.pedidos_cursores = [None]
+        historico = pedidos.buscar_historico(
+            conn.cursor(), st.session_state.user['id'], apos=st.session_state.pedidos_cursores[-1]
+        )
+
+        if historico:
+            for pedido, itens in historico:
                 with st.container():
                     st.write(f"**Pedido #{pedido[0]}** - {pedido[2]}")
                     st.write(f"Status: {pedido[4]} | Total: R$ {pedido[3]:,.2f}")
@@ -520,23 +679,29 @@ if st.session_state.user:
                     if pedido[4] == 'aguardando_pagamento' and pedido[5]:
                         st.markdown(f"[Pagar agora](https://checkout.stripe.com/c/pay/{pedido[5]})")
 
-                    itens = cursor.execute(
-                        "SELECT p.nome, i.quantidade, i.preco_unitario FROM itens_pedido i JOIN produtos p ON i.produto_id = p.id WHERE i.pedido_id = ?",
-                        (pedido[0],)
-                    ).fetchall()
                     for item in itens:
                         st.write(f"- {item[0]} ({item[1]}x) - R$ {item[2]:,.2f}")
+
+            mais_recentes, _, mais_antigos = st.columns([1, 4, 1])
+            if len(st.session_state.pedidos_cursores) > 1 and mais_recentes.button("← Mais recentes"):
+                st.session_state.pedidos_cursores.pop()
+                st.rerun(scope="fragment")
+            if len(historico) == pedidos.PEDIDOS_POR_PAGINA and mais_antigos.button("Mais antigos →"):
+                st.session_state.pedidos_cursores.append(pedidos.chave(historico[-1][0]))
+                st.rerun(scope="fragment")
         else:
             st.write("Você ainda não fez nenhum pedido")
 
-# --- CONTROLES DE PAGINAÇÃO ---
-st.write(f"Página {page} de {total_pages}")
-prev, _, next_ = st.columns([1, 10, 1])
-if prev.button("← Anterior") and page > 1:
-    st.session_state.page = page - 1
-    st.rerun()
-if next_.button("Próximo →") and page < total_pages:
-    st.session_state.page = page + 1
-    st.rerun()
-
-conn.close()
\ No newline at end of file
+
+if st.session_state.user:
+    perfil.marcar("carrinho")
+    secao_carrinho()
+    perfil.marcar("avaliacoes")
+    secao_avaliacoes()
+    perfil.marcar("pedidos")
+    secao_pedidos()
+
+# --- INSTRUMENTAÇÃO ---
+# Execuções interrompidas por st.rerun() antes deste ponto não são registradas;
+# reruns de fragmento também não (só o script inteiro passa por aqui)
+st.session_state.ultimo_perfil = estatisticas.finalizar(perfil)
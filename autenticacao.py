@@ -0,0 +1,130 @@
+"""Autenticação com bcrypt fora da thread de renderização.
+
+O bcrypt leva centenas de milissegundos de CPU por chamada; aqui ele roda em
+um pool de threads limitado (o bcrypt libera o GIL, então as chamadas rodam
+em paralelo de verdade). Acima da capacidade (workers + fila), novos pedidos
+são recusados com ``Sobrecarregado`` em vez de enfileirar indefinidamente.
+
+Hashes com custo diferente de ``custo`` são refeitos de forma transparente no
+próximo login bem-sucedido. Após o login, a sessão recebe um token de curta
+duração validado em memória a cada rerun, sem repetir o bcrypt.
+"""
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+CUSTO = int(os.getenv("BCRYPT_ROUNDS", 12))
+WORKERS = int(os.getenv("AUTH_WORKERS", os.cpu_count() or 2))
+FILA_MAXIMA = int(os.getenv("AUTH_FILA_MAXIMA", WORKERS * 4))
+TIMEOUT = 10.0               # segundos esperando o resultado do pool
+DURACAO_SESSAO = 30 * 60     # segundos de validade do token, renovados a cada uso
+INTERVALO_LIMPEZA = 60       # segundos entre varreduras de sessões expiradas
+
+
+class Sobrecarregado(Exception):
+    """Capacidade de autenticação esgotada; o cliente deve tentar de novo."""
+
+
+def _bytes(valor):
+    return valor.encode() if isinstance(valor, str) else valor
+
+
+def custo_do_hash(senha_hash):
+    """Custo (log2 de rounds) gravado no hash, ex.: ``$2b$12$...`` -> 12."""
+    try:
+        return int(_bytes(senha_hash).split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class ServicoAutenticacao:
+    def __init__(self, custo=CUSTO, workers=WORKERS, fila_maxima=FILA_MAXIMA,
+                 timeout=TIMEOUT, duracao_sessao=DURACAO_SESSAO):
+        self.custo = custo
+        self.timeout = timeout
+        self.duracao_sessao = duracao_sessao
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._vagas = threading.BoundedSemaphore(workers + fila_maxima)
+        self._sessoes = {}  # token -> (usuario, expira_em)
+        self._lock = threading.Lock()
+        self._proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA
+        # Hash de referência para gastar o mesmo tempo quando o email não existe
+        self._hash_ficticio = bcrypt.hashpw(b"", bcrypt.gensalt(custo))
+        self.recusados = 0
+
+    def _executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            self.recusados += 1
+            raise Sobrecarregado()
+        futuro = self._pool.submit(funcao, *args)
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            # Fila cheia de trabalho: para quem chama é o mesmo que sobrecarga
+            futuro.cancel()
+            self.recusados += 1
+            raise Sobrecarregado()
+
+    def gerar_hash(self, senha):
+        return self._executar(lambda s: bcrypt.hashpw(s, bcrypt.gensalt(self.custo)), _bytes(senha))
+
+    def verificar(self, senha, senha_hash):
+        return self._executar(bcrypt.checkpw, _bytes(senha), _bytes(senha_hash))
+
+    def autenticar(self, conn, email, senha):
+        """Retorna a linha de ``usuarios`` se as credenciais forem válidas, senão ``None``."""
+        user = conn.execute("SELECT * FROM usuarios WHERE email = ?", (email,)).fetchone()
+        if not user:
+            self.verificar(senha, self._hash_ficticio)
+            return None
+        if not self.verificar(senha, user[3]):
+            return None
+
+        if custo_do_hash(user[3]) != self.custo:
+            novo_hash = self.gerar_hash(senha)
+            with conn:
+                conn.execute("UPDATE usuarios SET senha_hash = ? WHERE id = ?", (novo_hash, user[0]))
+        return user
+
+    # --- Sessões verificadas ---
+
+    def abrir_sessao(self, usuario):
+        token = secrets.token_urlsafe(32)
+        agora = time.monotonic()
+        with self._lock:
+            self._sessoes[token] = (usuario, agora + self.duracao_sessao)
+            limpar = agora >= self._proxima_limpeza
+            if limpar:
+                self._proxima_limpeza = agora + INTERVALO_LIMPEZA
+        if limpar:
+            # Tokens abandonados (aba fechada sem logout) nunca voltam a ser conferidos
+            self.limpar_sessoes_expiradas()
+        return token
+
+    def sessao(self, token):
+        """Usuário da sessão ou ``None`` se o token for inválido/expirado."""
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._sessoes.get(token)
+            if entrada is None:
+                return None
+            if entrada[1] <= agora:
+                del self._sessoes[token]
+                return None
+            self._sessoes[token] = (entrada[0], agora + self.duracao_sessao)
+            return entrada[0]
+
+    def encerrar_sessao(self, token):
+        with self._lock:
+            self._sessoes.pop(token, None)
+
+    def limpar_sessoes_expiradas(self):
+        agora = time.monotonic()
+        with self._lock:
+            for token in [t for t, (_, expira) in self._sessoes.items() if expira <= agora]:
+                del self._sessoes[token]
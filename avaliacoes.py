@@ -0,0 +1,84 @@
+"""Agregados de avaliação por produto.
+
+``avaliacoes_resumo`` (soma, total e histograma de notas) e as colunas
+``produtos.media_avaliacoes``/``total_avaliacoes`` são mantidos por triggers
+em ``avaliacoes`` (migração 9), na mesma transação do INSERT da avaliação.
+
+``reconciliar`` recalcula tudo a partir de ``avaliacoes`` e relata as
+divergências: ``python avaliacoes.py ecommerce.db [--corrigir]``.
+"""
+import sqlite3
+import sys
+
+_ESPERADO = """
+    SELECT produto_id, SUM(nota), COUNT(*),
+           SUM(nota = 1), SUM(nota = 2), SUM(nota = 3), SUM(nota = 4), SUM(nota = 5)
+    FROM avaliacoes WHERE produto_id IS NOT NULL GROUP BY produto_id
+"""
+
+
+def histograma(cursor, produto_id):
+    """Quantidade de avaliações com 1 a 5 estrelas, nessa ordem."""
+    linha = cursor.execute(
+        "SELECT n1, n2, n3, n4, n5 FROM avaliacoes_resumo WHERE produto_id = ?",
+        (produto_id,)
+    ).fetchone()
+    return linha or (0, 0, 0, 0, 0)
+
+
+def divergencias(cursor):
+    """Lista ``(produto_id, esperado, atual)`` de cada produto com agregado errado.
+
+    Compara o resumo e as colunas de ``produtos`` com o recálculo completo.
+    """
+    esperado = {linha[0]: tuple(linha[1:]) for linha in cursor.execute(_ESPERADO)}
+    atual = {
+        linha[0]: tuple(linha[1:])
+        for linha in cursor.execute("SELECT produto_id, soma, total, n1, n2, n3, n4, n5 FROM avaliacoes_resumo")
+        if linha[2]
+    }
+    problemas = []
+    for produto_id in esperado.keys() | atual.keys():
+        if esperado.get(produto_id) != atual.get(produto_id):
+            problemas.append((produto_id, esperado.get(produto_id), atual.get(produto_id)))
+
+    for produto_id, media, total in cursor.execute(
+        "SELECT id, media_avaliacoes, total_avaliacoes FROM produtos"
+    ).fetchall():
+        soma, qtd = (esperado.get(produto_id) or (0, 0))[:2]
+        media_esperada = soma / qtd if qtd else 0
+        if total != qtd or abs((media or 0) - media_esperada) > 1e-9:
+            problemas.append((produto_id, (media_esperada, qtd), (media, total)))
+    return sorted(problemas, key=lambda p: p[0])
+
+
+def reconciliar(conn, corrigir=False):
+    """Relata as divergências e, com ``corrigir``, reconstrói os agregados."""
+    problemas = divergencias(conn.cursor())
+    if problemas and corrigir:
+        with conn:
+            conn.execute("DELETE FROM avaliacoes_resumo")
+            conn.execute(f"""
+                INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+                {_ESPERADO}
+            """)
+            conn.execute("""
+                UPDATE produtos SET
+                    total_avaliacoes = COALESCE((SELECT total FROM avaliacoes_resumo WHERE produto_id = produtos.id), 0),
+                    media_avaliacoes = COALESCE((SELECT soma * 1.0 / total FROM avaliacoes_resumo
+                                                 WHERE produto_id = produtos.id AND total > 0), 0)
+            """)
+    return problemas
+
+
+if __name__ == "__main__":
+    import migracoes
+
+    args = sys.argv[1:]
+    conn = sqlite3.connect(next((a for a in args if not a.startswith("--")), "ecommerce.db"))
+    migracoes.migrar(conn)
+    problemas = reconciliar(conn, corrigir="--corrigir" in args)
+    for produto_id, esperado, atual in problemas:
+        print(f"produto {produto_id}: esperado {esperado}, encontrado {atual}")
+    print(f"{len(problemas)} divergência(s)" + (" corrigida(s)" if problemas and "--corrigir" in args else ""))
+    conn.close()
@@ -0,0 +1,283 @@
+"""Benchmark reproduzível dos caminhos de dados da loja.
+
+Gera bancos sintéticos (mesmo schema das migrações) com N produtos, pedidos e
+avaliações, mede cada caminho de dados usado pelo ``app.py`` e, em seguida,
+simula sessões concorrentes no mesmo arquivo para medir vazão e contenção de
+locks. O resultado é um JSON (uma linha por escala) para comparar commits.
+
+Uso:
+    python benchmark.py                          # 1k produtos
+    python benchmark.py --escalas 1000,100000,1000000 --saida bench.jsonl
+    python benchmark.py --sessoes 8 --duracao 10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import catalogo
+import checkout
+import db
+import destaques
+import migracoes
+import pedidos
+from plano_consultas import CONSULTAS
+
+SEMENTE = 42
+CATEGORIAS = 20
+LOTE = 20000
+PALAVRAS = ("smart", "celular", "notebook", "cadeira", "mesa", "último", "ação", "fone",
+            "tênis", "camisa", "relógio", "câmera", "livro", "panela", "lâmpada")
+
+
+def _em_lotes(conn, sql, linhas):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= LOTE:
+            with conn:
+                conn.executemany(sql, lote)
+            lote.clear()
+    if lote:
+        with conn:
+            conn.executemany(sql, lote)
+
+
+def gerar_dados(caminho, n_produtos, semente=SEMENTE):
+    """Cria ``caminho`` com ``n_produtos`` produtos e o mesmo número de pedidos e avaliações."""
+    rnd = random.Random(semente)
+    n_usuarios = max(n_produtos // 10, 100)
+    conn = db.configurar(sqlite3.connect(caminho))
+    conn.execute("PRAGMA synchronous = OFF")
+    migracoes.migrar(conn)
+
+    with conn:
+        conn.executemany("INSERT INTO categorias (nome) VALUES (?)", [(f"Categoria {i}",) for i in range(CATEGORIAS)])
+    _em_lotes(conn, "INSERT INTO usuarios (nome, email, senha_hash) VALUES (?, ?, ?)", (
+        (f"Usuário {i}", f"usuario{i}@exemplo.com", "$2b$12$" + "x" * 53) for i in range(n_usuarios)
+    ))
+
+    def produto(i):
+        preco = round(rnd.uniform(5, 5000), 2)
+        promo = round(preco * rnd.uniform(0.5, 0.95), 2) if rnd.random() < 0.1 else 0
+        nome = " ".join(rnd.sample(PALAVRAS, 2)) + f" {i}"
+        descricao = " ".join(rnd.choices(PALAVRAS, k=8))
+        return (f"SKU{i}", nome, descricao, preco, promo, rnd.randint(1, CATEGORIAS))
+
+    _em_lotes(conn, """INSERT INTO produtos (sku, nome, descricao, preco, preco_promocional, categoria_id)
+                       VALUES (?, ?, ?, ?, ?, ?)""", (produto(i) for i in range(n_produtos)))
+    max_produto = conn.execute("SELECT MAX(id) FROM produtos").fetchone()[0]
+
+    _em_lotes(conn, "INSERT INTO pedidos (usuario_id, data_pedido, total, status) VALUES (?, ?, ?, 'aguardando_pagamento')", (
+        (rnd.randint(1, n_usuarios),
+         time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1_600_000_000 + rnd.randint(0, 10**8))),
+         round(rnd.uniform(10, 5000), 2))
+        for _ in range(n_produtos)
+    ))
+    _em_lotes(conn, "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)", (
+        (pedido_id, rnd.randint(1, max_produto), rnd.randint(1, 3), round(rnd.uniform(5, 5000), 2))
+        for pedido_id in range(1, n_produtos + 1)
+        for _ in range(rnd.randint(1, 3))
+    ))
+    _em_lotes(conn, "INSERT INTO avaliacoes (usuario_id, produto_id, nota, comentario) VALUES (?, ?, ?, ?)", (
+        (rnd.randint(1, n_usuarios), rnd.randint(1, max_produto), rnd.randint(1, 5), "ok")
+        for _ in range(n_produtos)
+    ))
+    conn.execute("ANALYZE")
+    conn.close()
+    return {"produtos": n_produtos, "usuarios": n_usuarios}
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        "repeticoes": repeticoes,
+        "media_ms": round(statistics.fmean(tempos), 4),
+        "p50_ms": round(tempos[len(tempos) // 2], 4),
+        "p95_ms": round(tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)], 4),
+        "max_ms": round(tempos[-1], 4),
+    }
+
+
+def caminhos_de_dados(conn, n_usuarios, semente=SEMENTE):
+    """Funções ``f(i)`` de cada caminho de dados do app, com parâmetros determinísticos."""
+    rnd = random.Random(semente)
+    cursor = conn.cursor()
+    max_produto = conn.execute("SELECT MAX(id) FROM produtos").fetchone()[0]
+    sql_carrinho = CONSULTAS["carrinho"][0]
+
+    def pagina_catalogo(i):
+        f = catalogo.Filtros(rnd.uniform(0, 1000), rnd.uniform(1000, 5000), "",
+                             rnd.choice(["Todas", f"Categoria {rnd.randrange(CATEGORIAS)}"]))
+        catalogo.contar_produtos(cursor, f)
+        cursores = {1: None}
+        for pagina in (1, 2, 3):
+            catalogo.registrar_cursor(f, pagina, catalogo.buscar_pagina_numero(cursor, f, pagina, cursores), cursores)
+
+    def busca_nome(i):
+        f = catalogo.Filtros(0.0, 10000.0, rnd.choice(PALAVRAS)[:4])
+        catalogo.contar_produtos(cursor, f)
+        catalogo.buscar_pagina(cursor, f)
+
+    def carrinho(i):
+        cursor.execute(sql_carrinho, (rnd.randint(1, n_usuarios),)).fetchall()
+
+    def finalizar(i):
+        usuario_id = rnd.randint(1, n_usuarios)
+        with conn:
+            conn.executemany(
+                """INSERT INTO carrinho (usuario_id, produto_id, quantidade) VALUES (?, ?, ?)
+                   ON CONFLICT(usuario_id, produto_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade""",
+                [(usuario_id, rnd.randint(1, max_produto), rnd.randint(1, 3)) for _ in range(3)]
+            )
+        checkout.finalizar_compra(conn, usuario_id, "benchmark")
+
+    def avaliar(i):
+        with conn:
+            conn.execute(
+                "INSERT INTO avaliacoes (usuario_id, produto_id, nota, comentario) VALUES (?, ?, ?, ?)",
+                (rnd.randint(1, n_usuarios), rnd.randint(1, max_produto), rnd.randint(1, 5), "bench")
+            )
+
+    def historico(i):
+        usuario_id = rnd.randint(1, n_usuarios)
+        pagina = pedidos.buscar_historico(cursor, usuario_id)
+        if pagina:
+            pedidos.buscar_historico(cursor, usuario_id, apos=pedidos.chave(pagina[-1][0]))
+
+    caminhos = {
+        "catalogo_pagina": pagina_catalogo,
+        "busca_nome": busca_nome,
+        "carrinho": carrinho,
+        "checkout": finalizar,
+        "avaliacao": avaliar,
+        "historico_pedidos": historico,
+    }
+    for nome in destaques.CONSULTAS:
+        caminhos[f"destaques_{nome}"] = lambda i, nome=nome: destaques.buscar(cursor, nome)
+    return caminhos
+
+
+def concorrencia(caminho, n_usuarios, sessoes, duracao, fracao_escrita=0.1):
+    """Sessões simultâneas (uma thread e conexão cada) misturando leituras e checkouts."""
+    fim = time.perf_counter() + duracao
+    resultados = []
+    lock = threading.Lock()
+
+    def sessao(numero):
+        conn = db.configurar(sqlite3.connect(caminho))
+        caminhos = caminhos_de_dados(conn, n_usuarios, semente=SEMENTE + numero)
+        leituras = [c for n, c in caminhos.items() if n not in ("checkout", "avaliacao")]
+        rnd = random.Random(SEMENTE + numero)
+        latencias = {"leitura": [], "escrita": []}
+        ocupado = conflitos = 0
+        while time.perf_counter() < fim:
+            escrita = rnd.random() < fracao_escrita
+            funcao = rnd.choice((caminhos["checkout"], caminhos["avaliacao"])) if escrita else rnd.choice(leituras)
+            inicio = time.perf_counter()
+            try:
+                funcao(0)
+            except sqlite3.OperationalError:
+                ocupado += 1
+                if conn.in_transaction:
+                    conn.rollback()
+                continue
+            except (checkout.CarrinhoAlterado, checkout.CarrinhoVazio):
+                # duas sessões finalizando o carrinho do mesmo usuário
+                conflitos += 1
+                continue
+            latencias["escrita" if escrita else "leitura"].append((time.perf_counter() - inicio) * 1000)
+        conn.close()
+        with lock:
+            resultados.append((latencias, ocupado, conflitos))
+
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(sessoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    relatorio = {
+        "sessoes": sessoes,
+        "duracao_s": duracao,
+        "erros_lock": sum(r[1] for r in resultados),
+        "conflitos_carrinho": sum(r[2] for r in resultados),
+    }
+    for tipo in ("leitura", "escrita"):
+        tempos = sorted(t for r in resultados for t in r[0][tipo])
+        relatorio[tipo] = {
+            "operacoes": len(tempos),
+            "ops_por_s": round(len(tempos) / duracao, 1),
+            "p50_ms": round(tempos[len(tempos) // 2], 3) if tempos else None,
+            "p95_ms": round(tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)], 3) if tempos else None,
+            "max_ms": round(tempos[-1], 3) if tempos else None,
+        }
+    return relatorio
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(n_produtos, repeticoes, sessoes, duracao, diretorio):
+    caminho = os.path.join(diretorio, f"bench_{n_produtos}.db")
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    inicio = time.perf_counter()
+    dados = gerar_dados(caminho, n_produtos)
+    geracao = time.perf_counter() - inicio
+
+    conn = db.configurar(sqlite3.connect(caminho))
+    caminhos = caminhos_de_dados(conn, dados["usuarios"])
+    for funcao in caminhos.values():  # aquece o cache de páginas
+        funcao(0)
+    tempos = {nome: _medir(funcao, repeticoes) for nome, funcao in caminhos.items()}
+    conn.close()
+
+    return {
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "escala": dados,
+        "geracao_s": round(geracao, 2),
+        "caminhos": tempos,
+        "concorrencia": concorrencia(caminho, dados["usuarios"], sessoes, duracao) if sessoes else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos de dados da loja.")
+    parser.add_argument("--escalas", default="1000", help="quantidades de produtos separadas por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    parser.add_argument("--sessoes", type=int, default=4, help="0 desativa o teste de concorrência")
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos do teste de concorrência")
+    parser.add_argument("--diretorio", default=tempfile.gettempdir())
+    parser.add_argument("--saida", help="arquivo JSON lines (padrão: stdout)")
+    args = parser.parse_args()
+
+    saida = open(args.saida, "a", encoding="utf-8") if args.saida else sys.stdout
+    for escala in (int(e) for e in args.escalas.split(",")):
+        resultado = executar(escala, args.repeticoes, args.sessoes, args.duracao, args.diretorio)
+        saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        saida.flush()
+    if args.saida:
+        saida.close()
@@ -0,0 +1,106 @@
+"""Cache de resultados de consultas com LRU, TTL e invalidação por tags.
+
+Uma única instância é compartilhada por todas as sessões do processo (no app,
+via ``st.cache_resource``). Cada entrada guarda as tags das tabelas de que
+depende; os caminhos de escrita chamam ``invalidar`` com essas tags.
+
+Cada tag tem um contador de geração incrementado por ``invalidar``: um
+resultado carregado enquanto uma de suas tags foi invalidada é devolvido a
+quem pediu, mas não é guardado.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRADAS = 1024
+TTL_PADRAO = 60  # segundos
+
+
+class CacheConsultas:
+    def __init__(self, max_entradas=MAX_ENTRADAS, ttl=TTL_PADRAO, relogio=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._relogio = relogio
+        self._entradas = OrderedDict()  # chave -> (expira_em, tags, valor)
+        self._por_tag = {}              # tag -> set(chaves)
+        self._geracoes = {}             # tag -> invalidações até agora
+        self._geracao_limpeza = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expiradas = 0
+        self.despejadas = 0
+        self.invalidadas = 0
+
+    def obter(self, chave, carregar, ttl=None, tags=()):
+        """Retorna o valor em cache ou chama ``carregar()`` e guarda o resultado."""
+        agora = self._relogio()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                if entrada[0] > agora:
+                    self._entradas.move_to_end(chave)
+                    self.hits += 1
+                    return entrada[2]
+                self._remover(chave)
+                self.expiradas += 1
+            self.misses += 1
+            geracoes = self._geracoes_de(tags)
+
+        # Carrega fora do lock: consultas lentas não bloqueiam outras sessões
+        valor = carregar()
+        expira_em = self._relogio() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            if self._geracoes_de(tags) != geracoes:
+                return valor  # invalidado durante a carga: não guarda o valor antigo
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (expira_em, tuple(tags), valor)
+            for tag in tags:
+                self._por_tag.setdefault(tag, set()).add(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._remover(next(iter(self._entradas)))
+                self.despejadas += 1
+        return valor
+
+    def invalidar(self, *tags):
+        """Remove todas as entradas associadas a qualquer uma das tags."""
+        with self._lock:
+            for tag in tags:
+                self._geracoes[tag] = self._geracoes.get(tag, 0) + 1
+                for chave in list(self._por_tag.get(tag, ())):
+                    self._remover(chave)
+                    self.invalidadas += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_tag.clear()
+            self._geracao_limpeza += 1
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": round(self.hits / total, 3) if total else 0.0,
+                "expiradas": self.expiradas,
+                "despejadas": self.despejadas,
+                "invalidadas": self.invalidadas,
+            }
+
+    def _geracoes_de(self, tags):
+        return (self._geracao_limpeza,) + tuple(self._geracoes.get(tag, 0) for tag in tags)
+
+    def _remover(self, chave):
+        _, tags, _ = self._entradas.pop(chave)
+        for tag in tags:
+            chaves = self._por_tag.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_tag[tag]
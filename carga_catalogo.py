@@ -0,0 +1,228 @@
+"""Importação e exportação em massa do catálogo de produtos.
+
+Os arquivos são lidos e escritos em streaming (CSV ou JSONL), sem carregar o
+catálogo inteiro na memória. Na importação, as categorias são resolvidas por
+nome com um mapa em memória (criando as que faltarem) e os produtos são
+gravados com upsert por ``sku`` em lotes de ``executemany``, um lote por
+transação. Linhas sem ``sku`` mas com ``id`` (produtos cadastrados pela
+interface, que não têm sku) são casadas pelo ``id``, então exportar e
+reimportar não duplica esses produtos.
+
+Colunas: id, sku, nome, descricao, preco, preco_promocional, imagem_url, categoria
+(``id`` e ``sku`` são opcionais).
+
+Uso:
+    python carga_catalogo.py importar produtos.csv [--db ecommerce.db] [--lote 5000]
+    python carga_catalogo.py exportar catalogo.jsonl [--db ecommerce.db]
+"""
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+import db
+import migracoes
+
+COLUNAS = ("id", "sku", "nome", "descricao", "preco", "preco_promocional", "imagem_url", "categoria")
+TAMANHO_LOTE = 5000
+
+# Pragmas só para a conexão da carga: menos fsync e cache maior
+PRAGMAS_CARGA = (
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -200000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+UPSERT = """
+    INSERT INTO produtos (sku, nome, descricao, preco, preco_promocional, imagem_url, categoria_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sku) DO UPDATE SET
+        nome = excluded.nome,
+        descricao = excluded.descricao,
+        preco = excluded.preco,
+        preco_promocional = excluded.preco_promocional,
+        imagem_url = excluded.imagem_url,
+        categoria_id = excluded.categoria_id
+"""
+
+# Mesmo upsert, casando pelo id (linhas sem sku)
+UPSERT_ID = """
+    INSERT INTO produtos (id, sku, nome, descricao, preco, preco_promocional, imagem_url, categoria_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        nome = excluded.nome,
+        descricao = excluded.descricao,
+        preco = excluded.preco,
+        preco_promocional = excluded.preco_promocional,
+        imagem_url = excluded.imagem_url,
+        categoria_id = excluded.categoria_id
+"""
+
+
+def _formato(caminho, formato):
+    if formato:
+        return formato
+    return "jsonl" if caminho.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def ler(caminho, formato=None):
+    """Gera ``(linha, registro)`` para cada registro do arquivo.
+
+    ``linha`` é o número da linha no arquivo (no CSV, o ``line_num`` do
+    leitor: conta o cabeçalho e, num campo entre aspas com quebras de linha,
+    aponta a última linha do registro). No CSV, o registro é um dicionário; no
+    JSONL, o texto de cada linha (inclusive as vazias), decodificado em
+    ``normalizar`` para que uma linha inválida vire um erro com número em vez
+    de interromper a importação.
+    """
+    with open(caminho, newline="", encoding="utf-8") as f:
+        if _formato(caminho, formato) == "jsonl":
+            yield from enumerate(f, start=1)
+        else:
+            leitor = csv.DictReader(f)
+            for registro in leitor:
+                yield leitor.line_num, registro
+
+
+def _numero(valor, padrao=0.0):
+    if valor in (None, ""):
+        return padrao
+    return float(str(valor).replace(",", ".")) if isinstance(valor, str) else float(valor)
+
+
+def normalizar(registros, erros):
+    """Converte os registros em tuplas; linhas inválidas vão para ``erros``."""
+    for numero, r in registros:
+        try:
+            if isinstance(r, str):
+                if not r.strip():
+                    continue
+                r = json.loads(r)
+                if not isinstance(r, dict):
+                    raise ValueError("a linha não é um objeto JSON")
+            nome = str(r.get("nome") or "").strip()
+            if not nome:
+                raise ValueError("nome vazio")
+            yield (
+                str(r.get("sku") or "").strip() or None,
+                nome,
+                r.get("descricao") or None,
+                _numero(r.get("preco"), None),
+                _numero(r.get("preco_promocional")),
+                r.get("imagem_url") or None,
+                str(r.get("categoria") or "").strip() or None,
+                int(r["id"]) if r.get("id") not in (None, "") else None,
+            )
+        except (ValueError, TypeError) as e:
+            erros.append((numero, str(e)))
+
+
+def lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while lote := list(islice(iterador, tamanho)):
+        yield lote
+
+
+class _Categorias:
+    """Mapa nome -> id de categorias, criando as que não existem."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = dict(conn.execute("SELECT nome, id FROM categorias"))
+
+    def resolver(self, nome):
+        if nome is None:
+            return None
+        if nome not in self.ids:
+            self.conn.execute("INSERT OR IGNORE INTO categorias (nome) VALUES (?)", (nome,))
+            self.ids[nome] = self.conn.execute("SELECT id FROM categorias WHERE nome = ?", (nome,)).fetchone()[0]
+        return self.ids[nome]
+
+
+def _conectar(caminho):
+    conn = db.configurar(sqlite3.connect(caminho))
+    migracoes.migrar(conn)
+    return conn
+
+
+def importar(caminho_db, arquivo, formato=None, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """Importa ``arquivo`` e retorna ``(linhas, erros, segundos)``."""
+    conn = _conectar(caminho_db)
+    for pragma in PRAGMAS_CARGA:
+        conn.execute(pragma)
+    categorias = _Categorias(conn)
+    erros = []
+    total = 0
+    inicio = time.perf_counter()
+    try:
+        for lote in lotes(normalizar(ler(arquivo, formato), erros), tamanho_lote):
+            por_sku = [(*r[:6], categorias.resolver(r[6])) for r in lote if r[0] or r[7] is None]
+            por_id = [(r[7], *r[:6], categorias.resolver(r[6])) for r in lote if not r[0] and r[7] is not None]
+            with conn:
+                conn.executemany(UPSERT, por_sku)
+                conn.executemany(UPSERT_ID, por_id)
+            total += len(lote)
+            if progresso:
+                progresso(total, time.perf_counter() - inicio)
+    finally:
+        conn.close()
+    return total, erros, time.perf_counter() - inicio
+
+
+def exportar(caminho_db, arquivo, formato=None, progresso=None, intervalo=50000):
+    """Exporta o catálogo em streaming e retorna ``(linhas, segundos)``."""
+    conn = _conectar(caminho_db)
+    formato = _formato(arquivo, formato)
+    inicio = time.perf_counter()
+    total = 0
+    try:
+        linhas = conn.execute("""
+            SELECT p.id, p.sku, p.nome, p.descricao, p.preco, p.preco_promocional, p.imagem_url, c.nome
+            FROM produtos p
+            LEFT JOIN categorias c ON p.categoria_id = c.id
+            ORDER BY p.id
+        """)
+        with open(arquivo, "w", newline="", encoding="utf-8") as f:
+            if formato == "jsonl":
+                escrever = lambda linha: f.write(json.dumps(dict(zip(COLUNAS, linha)), ensure_ascii=False) + "\n")
+            else:
+                escritor = csv.writer(f)
+                escritor.writerow(COLUNAS)
+                escrever = escritor.writerow
+            for linha in linhas:
+                escrever(linha)
+                total += 1
+                if progresso and total % intervalo == 0:
+                    progresso(total, time.perf_counter() - inicio)
+    finally:
+        conn.close()
+    return total, time.perf_counter() - inicio
+
+
+def _mostrar_progresso(total, segundos):
+    print(f"\r{total:,} linhas ({total / max(segundos, 1e-9):,.0f} linhas/s)", end="", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa/exporta o catálogo de produtos.")
+    parser.add_argument("acao", choices=["importar", "exportar"])
+    parser.add_argument("arquivo")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--formato", choices=["csv", "jsonl"])
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    if args.acao == "importar":
+        total, erros, segundos = importar(args.db, args.arquivo, args.formato, args.lote, _mostrar_progresso)
+        print(file=sys.stderr)
+        for numero, erro in erros[:20]:
+            print(f"linha {numero}: {erro}", file=sys.stderr)
+        print(f"{total:,} produtos importados em {segundos:.1f}s "
+              f"({total / max(segundos, 1e-9):,.0f} linhas/s), {len(erros)} linha(s) ignorada(s)")
+    else:
+        total, segundos = exportar(args.db, args.arquivo, args.formato, _mostrar_progresso)
+        print(file=sys.stderr)
+        print(f"{total:,} produtos exportados em {segundos:.1f}s ({total / max(segundos, 1e-9):,.0f} linhas/s)")
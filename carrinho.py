@@ -0,0 +1,184 @@
+"""Carrinho de compras em memória com persistência assíncrona (write-behind).
+
+Cada usuário tem um carrinho em memória com a quantidade de cada produto.
+Nome e preço não ficam em memória: ``itens`` lê os valores atuais de
+``produtos`` numa única consulta ``IN (...)``, então o total exibido é o mesmo
+que o checkout cobra. As alterações marcam o item como pendente e uma thread
+grava os pendentes em lote em ``carrinho`` (upsert em ``usuario_id, produto_id``).
+
+O carrinho de um usuário é recarregado do SQLite no primeiro acesso, então
+sobrevive a reinícios do processo. Antes do checkout, ``descarregar`` grava
+os pendentes do usuário de forma síncrona.
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+
+INTERVALO_FLUSH = 0.5      # segundos entre gravações em lote
+MAX_CARRINHOS = 10000      # carrinhos mantidos em memória
+TEMPO_OCIOSO = 3600        # segundos sem uso até o carrinho poder sair da memória
+
+
+class ItemCarrinho(NamedTuple):
+    produto_id: int
+    nome: str
+    preco: float
+    quantidade: int
+    imagem_url: Optional[str]
+
+
+class _Carrinho:
+    __slots__ = ("quantidades", "acesso")
+
+    def __init__(self, quantidades):
+        self.quantidades = dict(quantidades)  # produto_id -> quantidade
+        self.acesso = time.monotonic()
+
+
+class ServicoCarrinho:
+    def __init__(self, conexao, intervalo=INTERVALO_FLUSH, max_carrinhos=MAX_CARRINHOS):
+        """``conexao()`` deve retornar uma conexão SQLite válida na thread atual."""
+        self._conexao = conexao
+        self.intervalo = intervalo
+        self.max_carrinhos = max_carrinhos
+        self._carrinhos = {}
+        self._pendentes = set()  # (usuario_id, produto_id)
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self.gravacoes = 0
+
+    # --- Leitura ---
+
+    def _carregar(self, usuario_id):
+        carrinho = self._carrinhos.get(usuario_id)
+        if carrinho is None:
+            linhas = self._conexao().execute(
+                "SELECT produto_id, quantidade FROM carrinho WHERE usuario_id = ?", (usuario_id,)
+            ).fetchall()
+            carrinho = self._carrinhos[usuario_id] = _Carrinho(linhas)
+        carrinho.acesso = time.monotonic()
+        return carrinho
+
+    def itens(self, usuario_id):
+        """Itens do carrinho com nome e preço atuais de ``produtos``.
+
+        Produtos que não existem mais ficam de fora, como no checkout.
+        """
+        with self._lock:
+            quantidades = dict(self._carregar(usuario_id).quantidades)
+        if not quantidades:
+            return []
+        marcadores = ",".join("?" * len(quantidades))
+        linhas = self._conexao().execute(
+            f"SELECT id, nome, preco, imagem_url FROM produtos WHERE id IN ({marcadores})",
+            list(quantidades)
+        ).fetchall()
+        produtos = {linha[0]: linha for linha in linhas}
+        return [
+            ItemCarrinho(produto_id, produtos[produto_id][1], produtos[produto_id][2],
+                         quantidade, produtos[produto_id][3])
+            for produto_id, quantidade in quantidades.items() if produto_id in produtos
+        ]
+
+    def total(self, usuario_id):
+        return sum(item.preco * item.quantidade for item in self.itens(usuario_id))
+
+    # --- Escrita ---
+
+    def adicionar(self, usuario_id, produto_id, quantidade=1):
+        with self._lock:
+            carrinho = self._carregar(usuario_id)
+            atual = carrinho.quantidades.get(produto_id)
+            if atual is None:
+                existe = self._conexao().execute(
+                    "SELECT 1 FROM produtos WHERE id = ?", (produto_id,)
+                ).fetchone()
+                if existe is None:
+                    raise KeyError(produto_id)
+                atual = 0
+            carrinho.quantidades[produto_id] = atual + quantidade
+            self._pendentes.add((usuario_id, produto_id))
+
+    def remover(self, usuario_id, produto_id):
+        with self._lock:
+            carrinho = self._carregar(usuario_id)
+            if carrinho.quantidades.pop(produto_id, None) is not None:
+                self._pendentes.add((usuario_id, produto_id))
+
+    def esquecer(self, usuario_id):
+        """Descarta o carrinho em memória (ex.: após o checkout limpar a tabela)."""
+        with self._lock:
+            self._carrinhos.pop(usuario_id, None)
+            self._pendentes = {p for p in self._pendentes if p[0] != usuario_id}
+
+    # --- Persistência ---
+
+    def _gravar(self, pendentes):
+        upserts, remocoes = [], []
+        with self._lock:
+            for usuario_id, produto_id in pendentes:
+                carrinho = self._carrinhos.get(usuario_id)
+                quantidade = carrinho.quantidades.get(produto_id) if carrinho else None
+                if quantidade is not None:
+                    upserts.append((usuario_id, produto_id, quantidade))
+                elif carrinho is not None:
+                    remocoes.append((usuario_id, produto_id))
+            self._pendentes -= set(pendentes)
+
+        if not upserts and not remocoes:
+            return
+        conn = self._conexao()
+        try:
+            with conn:
+                conn.executemany(
+                    """INSERT INTO carrinho (usuario_id, produto_id, quantidade) VALUES (?, ?, ?)
+                       ON CONFLICT(usuario_id, produto_id) DO UPDATE SET quantidade = excluded.quantidade""",
+                    upserts
+                )
+                conn.executemany("DELETE FROM carrinho WHERE usuario_id = ? AND produto_id = ?", remocoes)
+        except Exception:
+            # Mantém os itens como pendentes para a próxima tentativa
+            with self._lock:
+                self._pendentes |= set(pendentes)
+            raise
+        self.gravacoes += 1
+
+    def descarregar(self, usuario_id=None):
+        """Grava agora os pendentes (de um usuário ou de todos)."""
+        with self._flush_lock:
+            with self._lock:
+                pendentes = [p for p in self._pendentes if usuario_id is None or p[0] == usuario_id]
+            self._gravar(pendentes)
+
+    def _liberar_memoria(self):
+        with self._lock:
+            if len(self._carrinhos) <= self.max_carrinhos:
+                return
+            limite = time.monotonic() - TEMPO_OCIOSO
+            com_pendentes = {p[0] for p in self._pendentes}
+            for usuario_id, carrinho in list(self._carrinhos.items()):
+                if carrinho.acesso < limite and usuario_id not in com_pendentes:
+                    del self._carrinhos[usuario_id]
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.descarregar()
+                self._liberar_memoria()
+            except Exception:
+                pass  # nova tentativa no próximo ciclo
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="carrinho-flush", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.descarregar()
@@ -0,0 +1,130 @@
+"""Consultas paginadas do catálogo de produtos.
+
+A listagem usa paginação por chave (keyset/seek): em vez de carregar todos
+os produtos filtrados e fatiar em Python, cada página busca apenas
+``ITENS_POR_PAGINA`` linhas a partir da chave ``(ordem, id)`` da última
+linha da página anterior.
+"""
+import re
+from typing import NamedTuple
+
+ITENS_POR_PAGINA = 5
+
+# Colunas de ordenação suportadas: (expressão SQL, índice na linha retornada).
+# "relevancia" só existe com busca por texto: a pontuação bm25 vem como
+# última coluna da linha (menor = mais relevante).
+ORDENACOES = {
+    "preco": ("p.preco", 3),
+    "nome": ("p.nome", 1),
+    "relevancia": ("bm25(produtos_fts)", -1),
+}
+
+
+# Colunas de produto na ordem esperada pela interface (produto[0] ... produto[8]);
+# explícitas para que novas colunas em ``produtos`` não desloquem os índices
+COLUNAS_PRODUTO = (
+    "p.id, p.nome, p.descricao, p.preco, p.imagem_url, p.categoria_id, "
+    "p.media_avaliacoes, p.total_avaliacoes, p.preco_promocional"
+)
+
+
+class Filtros(NamedTuple):
+    min_price: float
+    max_price: float
+    search_term: str = ""
+    categoria: str = "Todas"
+
+
+def expressao_busca(termo):
+    """Converte o texto digitado em uma consulta FTS5 de prefixos.
+
+    Cada palavra vira ``"palavra"*`` (todas precisam aparecer); aspas e
+    operadores digitados pelo usuário são tratados como texto comum.
+    """
+    palavras = re.findall(r"\w+", termo)
+    return " ".join(f'"{p}"*' for p in palavras)
+
+
+def _from_where(filtros):
+    """Monta FROM/JOIN da busca, a cláusula WHERE e seus parâmetros."""
+    from_ = "FROM produtos p"
+    where = "WHERE p.preco BETWEEN ? AND ?"
+    params = [filtros.min_price, filtros.max_price]
+
+    busca = expressao_busca(filtros.search_term)
+    if busca:
+        from_ += " JOIN produtos_fts ON produtos_fts.rowid = p.id"
+        where += " AND produtos_fts MATCH ?"
+        params.append(busca)
+
+    if filtros.categoria != "Todas":
+        where += " AND p.categoria_id = (SELECT id FROM categorias WHERE nome = ?)"
+        params.append(filtros.categoria)
+
+    return from_, where, params
+
+
+def ordem_padrao(filtros):
+    return "relevancia" if expressao_busca(filtros.search_term) else "preco"
+
+
+def contar_produtos(cursor, filtros):
+    """Total de produtos que atendem aos filtros (consulta COUNT separada)."""
+    from_, where, params = _from_where(filtros)
+    return cursor.execute(f"SELECT COUNT(*) {from_} {where}", params).fetchone()[0]
+
+
+def total_paginas(total, por_pagina=ITENS_POR_PAGINA):
+    return max((total + por_pagina - 1) // por_pagina, 1)
+
+
+def buscar_pagina(cursor, filtros, apos=None, offset=0, limite=ITENS_POR_PAGINA, ordem=None):
+    """Busca uma página de produtos no formato ``COLUNAS_PRODUTO`` + nome da categoria.
+
+    ``apos`` é a chave ``(valor_ordem, id)`` da última linha da página anterior;
+    quando não é conhecida (salto direto para uma página), usa-se ``offset``.
+    """
+    ordem = ordem or ordem_padrao(filtros)
+    coluna, _ = ORDENACOES[ordem]
+    from_, where, params = _from_where(filtros)
+    extra = f", {coluna} as relevancia" if ordem == "relevancia" else ""
+
+    if apos is not None:
+        where += f" AND ({coluna}, p.id) > (?, ?)"
+        params.extend(apos)
+        offset = 0
+
+    query = f"""
+        SELECT {COLUNAS_PRODUTO}, c.nome as categoria{extra}
+        {from_}
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        {where}
+        ORDER BY {coluna}, p.id
+        LIMIT ? OFFSET ?
+    """
+    params.extend([limite, offset])
+    return cursor.execute(query, params).fetchall()
+
+
+def chave(produto, ordem="preco"):
+    """Chave de paginação ``(valor_ordem, id)`` de uma linha retornada."""
+    _, indice = ORDENACOES[ordem]
+    return (produto[indice], produto[0])
+
+
+def buscar_pagina_numero(cursor, filtros, page, cursores, ordem=None):
+    """Busca a página ``page`` reaproveitando as chaves já conhecidas.
+
+    ``cursores`` mapeia número da página -> chave de início (normalmente
+    guardado em ``st.session_state``); sem a chave, cai para ``OFFSET``.
+    """
+    ordem = ordem or ordem_padrao(filtros)
+    if page in cursores:
+        return buscar_pagina(cursor, filtros, apos=cursores[page], ordem=ordem)
+    return buscar_pagina(cursor, filtros, offset=(page - 1) * ITENS_POR_PAGINA, ordem=ordem)
+
+
+def registrar_cursor(filtros, page, produtos, cursores, ordem=None):
+    """Guarda em ``cursores`` a chave de início da página seguinte."""
+    if produtos:
+        cursores[page + 1] = chave(produtos[-1], ordem or ordem_padrao(filtros))
@@ -0,0 +1,111 @@
+"""Finalização de compra em uma única transação curta.
+
+1. leitura do carrinho com os preços atuais de ``produtos`` (sem lock);
+2. ``BEGIN IMMEDIATE`` com o pedido, todos os itens em um ``executemany``, o
+   job de pagamento na fila (``pagamentos.enfileirar``) e a limpeza do
+   carrinho — ou nada, em caso de erro.
+
+O provedor de pagamento nunca é chamado aqui: o intent é criado depois pelo
+``pagamentos.ProcessadorPagamentos``, que preenche ``pedidos.payment_intent``.
+
+A chave de idempotência é derivada do conteúdo do carrinho: um clique duplo
+(ou uma nova tentativa após erro) devolve o mesmo pedido em vez de criar outro.
+"""
+import hashlib
+import sqlite3
+from typing import NamedTuple, Optional
+
+import pagamentos
+
+
+class CarrinhoVazio(Exception):
+    pass
+
+
+class CarrinhoAlterado(Exception):
+    """O carrinho mudou entre a leitura e a gravação do pedido."""
+
+
+class Pedido(NamedTuple):
+    id: int
+    total: float
+    payment_intent: Optional[str]
+    novo: bool
+
+
+def itens_do_carrinho(cursor, usuario_id):
+    """Itens do carrinho com o preço atual de cada produto (nunca o do cliente)."""
+    return cursor.execute(
+        """
+        SELECT c.id, c.produto_id, c.quantidade, p.preco
+        FROM carrinho c
+        JOIN produtos p ON c.produto_id = p.id
+        WHERE c.usuario_id = ?
+        ORDER BY c.id
+        """,
+        (usuario_id,)
+    ).fetchall()
+
+
+def chave_idempotencia(usuario_id, itens):
+    conteudo = ";".join(f"{i[0]}:{i[1]}:{i[2]}" for i in itens)
+    return hashlib.sha256(f"{usuario_id}|{conteudo}".encode()).hexdigest()
+
+
+def _pedido_existente(cursor, chave):
+    linha = cursor.execute(
+        "SELECT id, total, payment_intent FROM pedidos WHERE chave_idempotencia = ?",
+        (chave,)
+    ).fetchone()
+    return Pedido(*linha, novo=False) if linha else None
+
+
+def finalizar_compra(conn, usuario_id, descricao):
+    """Cria o pedido a partir do carrinho de ``usuario_id`` e enfileira o pagamento."""
+    cursor = conn.cursor()
+    itens = itens_do_carrinho(cursor, usuario_id)
+    if not itens:
+        raise CarrinhoVazio()
+
+    chave = chave_idempotencia(usuario_id, itens)
+    existente = _pedido_existente(cursor, chave)
+    if existente:
+        return existente
+
+    total = round(sum(i[2] * i[3] for i in itens), 2)
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        existente = _pedido_existente(cursor, chave)
+        if existente:
+            conn.rollback()
+            return existente
+
+        if itens_do_carrinho(cursor, usuario_id) != itens:
+            raise CarrinhoAlterado()
+
+        cursor.execute(
+            """INSERT INTO pedidos (usuario_id, total, status, chave_idempotencia)
+               VALUES (?, ?, 'processando_pagamento', ?)""",
+            (usuario_id, total, chave)
+        )
+        pedido_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)",
+            [(pedido_id, i[1], i[2], i[3]) for i in itens]
+        )
+        pagamentos.enfileirar(cursor, pedido_id, total, descricao, chave)
+        cursor.executemany("DELETE FROM carrinho WHERE id = ?", [(i[0],) for i in itens])
+        conn.commit()
+    except sqlite3.IntegrityError:
+        # Outra sessão gravou o mesmo pedido entre a verificação e o INSERT
+        conn.rollback()
+        existente = _pedido_existente(cursor, chave)
+        if existente:
+            return existente
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+
+    return Pedido(pedido_id, total, None, novo=True)
@@ -0,0 +1,202 @@
+"""Gerenciamento de conexões SQLite compartilhado pelo processo.
+
+O Streamlit executa o script de cada sessão em sua própria thread, então o
+gerenciador entrega uma conexão por thread (conexões ``sqlite3`` não devem ser
+compartilhadas entre threads) e aplica as migrações apenas uma vez por processo.
+
+As leituras de navegação (catálogo, destaques, facetas) podem usar conexões
+separadas das escritas, conforme ``ECOMMERCE_LEITURA``:
+
+- ``primario`` (padrão): a mesma conexão das escritas;
+- ``somente_leitura``: conexões ``mode=ro`` no mesmo arquivo; o WAL garante
+  que não bloqueiam o checkout, e elas nunca seguram o lock de escrita;
+- ``snapshot``: uma cópia do banco feita com a API de backup do SQLite e
+  renovada por uma thread em segundo plano a cada ``ECOMMERCE_DEFASAGEM_MAX``
+  segundos, só quando o banco principal mudou (``PRAGMA data_version``);
+  as sessões só passam a ler a cópia nova.
+  Leituras longas não impedem checkpoints do WAL principal nem disputam o
+  cache de páginas das escritas.
+"""
+import os
+import sqlite3
+import threading
+
+import migracoes
+
+DB_PATH = os.getenv("ECOMMERCE_DB", "ecommerce.db")
+
+# Pragmas aplicados a cada nova conexão
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",      # leitores não bloqueiam escritores
+    "PRAGMA synchronous = NORMAL",    # seguro em WAL e bem mais rápido que FULL
+    "PRAGMA busy_timeout = 5000",     # espera em vez de SQLITE_BUSY imediato
+    "PRAGMA cache_size = -20000",     # ~20 MB de cache de páginas por conexão
+    "PRAGMA mmap_size = 268435456",   # 256 MB de I/O mapeado em memória
+    "PRAGMA temp_store = MEMORY",
+)
+CACHED_STATEMENTS = 256
+
+MODOS_LEITURA = ("primario", "somente_leitura", "snapshot")
+MODO_LEITURA = os.getenv("ECOMMERCE_LEITURA", "primario")
+DEFASAGEM_MAX = float(os.getenv("ECOMMERCE_DEFASAGEM_MAX", "30"))  # segundos
+
+
+def configurar(conn):
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class GerenciadorConexoes:
+    """Entrega uma conexão SQLite configurada por thread.
+
+    Deve ser criado uma única vez por processo (no app, via
+    ``st.cache_resource``); as migrações pendentes rodam na construção.
+    """
+
+    def __init__(self, caminho=DB_PATH, modo_leitura=MODO_LEITURA, defasagem_max=DEFASAGEM_MAX):
+        if modo_leitura not in MODOS_LEITURA:
+            raise ValueError(f"Modo de leitura desconhecido: {modo_leitura!r}")
+        self.caminho = caminho
+        self.modo_leitura = modo_leitura
+        self.defasagem_max = defasagem_max
+        self.ao_renovar = []  # chamados após cada novo snapshot (ex.: invalidar caches)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lock_snapshot = threading.Lock()
+        self._conexoes = []
+        self._geracao = 0
+        self._parar = threading.Event()
+        self._renovador = None
+        self._origem_snapshot = None  # conexão própria: data_version só muda com commits de outras
+        self._versao_snapshot = None
+        migracoes.migrar(self.conexao())
+        if modo_leitura == "snapshot":
+            self._origem_snapshot = configurar(sqlite3.connect(self.caminho, check_same_thread=False))
+            self.renovar_snapshot()
+            self._renovador = threading.Thread(target=self._renovar_periodicamente, name="snapshot", daemon=True)
+            self._renovador.start()
+
+    def conexao(self):
+        return self._obter(("escrita",), lambda: configurar(sqlite3.connect(
+            self.caminho,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False,
+        )))
+
+    def _obter(self, tipo, abrir):
+        """Conexão ``tipo`` da thread atual.
+
+        O Streamlit cria uma thread nova a cada rerun (e a cada rerun de
+        fragmento), então conexões de threads que já terminaram são
+        reaproveitadas em vez de abrir uma nova a cada interação.
+        """
+        locais = self._local.__dict__.setdefault("conexoes", {})
+        conn = locais.get(tipo)
+        if conn is not None:
+            return conn
+        atual = threading.current_thread()
+        descartadas = []
+        with self._lock:
+            for entrada in self._conexoes:
+                if entrada[0].is_alive() and entrada[0] is not atual:
+                    continue
+                if entrada[1] == tipo and conn is None:
+                    entrada[0] = atual
+                    conn = entrada[2]
+                elif entrada[1][0] == "leitura" and entrada[1] != tipo and tipo[0] == "leitura":
+                    descartadas.append(entrada)  # snapshot antigo
+            for entrada in descartadas:
+                self._conexoes.remove(entrada)
+        for entrada in descartadas:
+            locais.pop(entrada[1], None)
+            entrada[2].close()
+        if conn is None:
+            conn = abrir()
+            with self._lock:
+                self._conexoes.append([atual, tipo, conn])
+        elif conn.in_transaction:
+            conn.rollback()  # a thread anterior terminou no meio de uma transação
+        locais[tipo] = conn
+        return conn
+
+    @property
+    def caminho_snapshot(self):
+        return f"{self.caminho}.snapshot"
+
+    def leitura(self):
+        """Conexão para leituras de navegação, conforme ``modo_leitura``.
+
+        Não use para dados que o próprio usuário acabou de gravar (carrinho,
+        pedidos, avaliação própria): em ``snapshot`` podem estar até
+        ``defasagem_max`` segundos atrasados.
+        """
+        if self.modo_leitura == "primario":
+            return self.conexao()
+        if self.modo_leitura == "snapshot":
+            uri = f"file:{self.caminho_snapshot}?immutable=1"
+        else:
+            uri = f"file:{self.caminho}?mode=ro"
+
+        def abrir():
+            conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+            configurar(conn).execute("PRAGMA query_only = ON")
+            return conn
+
+        # A geração faz parte do tipo: um snapshot novo exige reabrir o arquivo
+        return self._obter(("leitura", self._geracao), abrir)
+
+    def renovar_snapshot(self, bloquear=True):
+        """Copia o banco principal para ``caminho_snapshot`` (API de backup).
+
+        A cópia é feita em um arquivo temporário e trocada atomicamente; as
+        conexões de leitura reabrem na próxima chamada a ``leitura``. Retorna
+        ``False`` sem copiar se nada foi gravado desde a última cópia ou, com
+        ``bloquear=False``, se outra thread já está copiando. Os callbacks de
+        ``ao_renovar`` só rodam quando uma cópia nova é feita.
+        """
+        if not self._lock_snapshot.acquire(blocking=bloquear):
+            return False
+        try:
+            versao = self._origem_snapshot.execute("PRAGMA data_version").fetchone()[0]
+            if versao == self._versao_snapshot:
+                return False
+            temporario = f"{self.caminho_snapshot}.tmp"
+            destino = sqlite3.connect(temporario)
+            try:
+                self._origem_snapshot.backup(destino)
+                # Sem WAL: o snapshot é aberto como imutável, sem -wal/-shm
+                destino.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                destino.close()
+            os.replace(temporario, self.caminho_snapshot)
+            self._versao_snapshot = versao
+            self._geracao += 1
+        finally:
+            self._lock_snapshot.release()
+        for callback in self.ao_renovar:
+            callback()
+        return True
+
+    def _renovar_periodicamente(self):
+        # A cópia roda aqui, fora das threads das sessões
+        while not self._parar.wait(self.defasagem_max):
+            try:
+                self.renovar_snapshot()
+            except (sqlite3.Error, OSError):
+                pass  # tenta de novo no próximo intervalo; a cópia anterior segue válida
+
+    def fechar(self):
+        """Fecha todas as conexões abertas (ex.: ao encerrar o processo)."""
+        self._parar.set()
+        if self._renovador is not None:
+            self._renovador.join()
+            self._renovador = None
+        if self._origem_snapshot is not None:
+            self._origem_snapshot.close()
+            self._origem_snapshot = None
+        with self._lock:
+            for _, _, conn in self._conexoes:
+                conn.close()
+            self._conexoes.clear()
+        self._local = threading.local()
@@ -0,0 +1,76 @@
+"""Listas das abas de Destaques.
+
+Cada lista é uma leitura em ordem de índice limitada a 5 linhas, com custo
+independente do tamanho do histórico de pedidos:
+
+- Mais Vendidos lê ``vendas_produto``, atualizada por triggers a cada item de
+  pedido inserido, removido ou alterado;
+- Melhores Avaliados usa um índice parcial em ``media_avaliacoes`` mantido
+  pelo próprio SQLite quando uma avaliação atualiza o produto;
+- Melhores Preços e Promoções usam índices em ``preco`` e no desconto, que
+  acompanham qualquer mudança de preço.
+
+``reconstruir`` refaz ``vendas_produto`` do zero a partir de ``itens_pedido``
+(ex.: em um job periódico): ``python destaques.py ecommerce.db``.
+"""
+import sqlite3
+import sys
+
+from catalogo import COLUNAS_PRODUTO
+
+LIMITE = 5
+
+CONSULTAS = {
+    "mais_vendidos": f"""
+        SELECT {COLUNAS_PRODUTO}, v.total_vendido
+        FROM vendas_produto v
+        JOIN produtos p ON p.id = v.produto_id
+        WHERE v.total_vendido > 0
+        ORDER BY v.total_vendido DESC
+        LIMIT {LIMITE}
+    """,
+    "melhores_avaliados": f"""
+        SELECT {COLUNAS_PRODUTO}, (p.media_avaliacoes * 20) as porcentagem
+        FROM produtos p
+        WHERE total_avaliacoes >= 5
+        ORDER BY media_avaliacoes DESC
+        LIMIT {LIMITE}
+    """,
+    "melhores_precos": f"""
+        SELECT {COLUNAS_PRODUTO} FROM produtos p
+        WHERE preco > 0
+        ORDER BY preco ASC
+        LIMIT {LIMITE}
+    """,
+    "promocoes": f"""
+        SELECT {COLUNAS_PRODUTO} FROM produtos p
+        WHERE preco_promocional > 0 AND preco_promocional < preco
+        ORDER BY (preco - preco_promocional) DESC
+        LIMIT {LIMITE}
+    """,
+}
+
+
+def buscar(cursor, nome):
+    return cursor.execute(CONSULTAS[nome]).fetchall()
+
+
+def reconstruir(conn):
+    """Recalcula ``vendas_produto`` a partir de todo o histórico de pedidos."""
+    with conn:
+        conn.execute("DELETE FROM vendas_produto")
+        conn.execute("""
+            INSERT INTO vendas_produto (produto_id, total_vendido)
+            SELECT produto_id, SUM(quantidade) FROM itens_pedido
+            WHERE produto_id IS NOT NULL GROUP BY produto_id
+        """)
+
+
+if __name__ == "__main__":
+    import migracoes
+
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else "ecommerce.db")
+    migracoes.migrar(conn)
+    reconstruir(conn)
+    print("Destaques reconstruídos")
+    conn.close()
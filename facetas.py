@@ -0,0 +1,174 @@
+"""Contagens de facetas (categoria e faixa de preço) em memória.
+
+O índice guarda três arrays NumPy alinhados e ordenados por id de produto:
+``ids``, ``precos`` e ``categorias``. As contagens para a combinação atual de
+filtros saem de máscaras booleanas e ``np.bincount``/``np.searchsorted``, sem
+tocar na tabela ``produtos``.
+
+Cada faceta ignora o próprio filtro (a contagem por categoria considera busca
+e preço; o histograma de preço considera busca e categoria), como é usual em
+navegação facetada.
+
+O índice é mantido pelo log ``produtos_alteracoes`` (triggers em
+``produtos``): ``atualizar`` aplica só os produtos alterados desde a última
+leitura. Se o log tiver sido podado além desse ponto, ou houver alterações
+demais, o índice é reconstruído por inteiro.
+
+``podar`` apaga do log o que o índice já aplicou (a cada ``PODAR_A_CADA``
+alterações). Com vários processos, um índice que ainda não tinha lido as
+linhas apagadas percebe o salto na sequência (ou, se o log ficou vazio, que
+``sqlite_sequence`` passou do seu ``seq``) e se reconstrói.
+"""
+import threading
+
+import numpy as np
+
+# Limites das faixas do histograma de preço (a última faixa é aberta)
+FAIXAS_PRECO = (0, 50, 100, 250, 500, 1000, 2500, 5000)
+SEM_CATEGORIA = 0  # as categorias são guardadas como categoria_id + 1
+FRACAO_RECONSTRUCAO = 0.1  # acima disso, reconstruir é mais barato que aplicar o log
+PODAR_A_CADA = 1000  # alterações aplicadas entre duas podas do log
+TTL_BUSCA = 15  # segundos; cada prefixo digitado gera uma entrada de ids no cache
+
+
+class IndiceFacetas:
+    def __init__(self, faixas=FAIXAS_PRECO):
+        self.faixas = np.asarray(faixas, dtype=np.float64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.precos = np.empty(0, dtype=np.float64)
+        self.categorias = np.empty(0, dtype=np.int64)
+        self.seq = 0
+        self._podado = 0
+        self._lock = threading.Lock()
+
+    # --- Manutenção ---
+
+    def _ultimo_seq(self, conn):
+        # sqlite_sequence guarda o maior seq já usado, mesmo depois de uma poda
+        linha = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'produtos_alteracoes'"
+        ).fetchone()
+        return linha[0] if linha else 0
+
+    def reconstruir(self, conn):
+        seq = self._ultimo_seq(conn)
+        linhas = conn.execute("SELECT id, preco, categoria_id FROM produtos ORDER BY id").fetchall()
+        ids, precos, categorias = self._arrays(linhas)
+        with self._lock:
+            self.ids, self.precos, self.categorias, self.seq = ids, precos, categorias, seq
+
+    @staticmethod
+    def _arrays(linhas):
+        n = len(linhas)
+        ids = np.fromiter((l[0] for l in linhas), dtype=np.int64, count=n)
+        precos = np.fromiter((np.nan if l[1] is None else l[1] for l in linhas), dtype=np.float64, count=n)
+        categorias = np.fromiter((SEM_CATEGORIA if l[2] is None else l[2] + 1 for l in linhas),
+                                 dtype=np.int64, count=n)
+        return ids, precos, categorias
+
+    def atualizar(self, conn):
+        """Aplica as alterações registradas desde a última leitura."""
+        menor, maior = conn.execute(
+            "SELECT MIN(seq), MAX(seq) FROM produtos_alteracoes WHERE seq > ?", (self.seq,)
+        ).fetchone()
+        if maior is None:
+            # Log vazio: se a sequência andou, as alterações foram podadas antes de lidas
+            if self._ultimo_seq(conn) > self.seq:
+                self.reconstruir(conn)
+            return
+        # AUTOINCREMENT não deixa buracos: um salto significa log podado
+        podado = self.seq > 0 and menor > self.seq + 1
+        if podado or maior - self.seq > max(len(self.ids) * FRACAO_RECONSTRUCAO, 1000):
+            self.reconstruir(conn)
+            return
+
+        alterados = sorted({l[0] for l in conn.execute(
+            "SELECT produto_id FROM produtos_alteracoes WHERE seq > ? AND seq <= ?", (self.seq, maior)
+        )})
+        marcadores = ",".join("?" * len(alterados))
+        atuais = conn.execute(
+            f"SELECT id, preco, categoria_id FROM produtos WHERE id IN ({marcadores}) ORDER BY id", alterados
+        ).fetchall()
+
+        with self._lock:
+            ids, precos, categorias = self.ids.copy(), self.precos.copy(), self.categorias.copy()
+            # Removidos viram lápides (preço NaN não entra em nenhuma máscara)
+            existentes = {l[0] for l in atuais}
+            for produto_id in alterados:
+                if produto_id not in existentes:
+                    pos = np.searchsorted(ids, produto_id)
+                    if pos < len(ids) and ids[pos] == produto_id:
+                        precos[pos] = np.nan
+            novos = []
+            for linha in atuais:
+                pos = np.searchsorted(ids, linha[0])
+                if pos < len(ids) and ids[pos] == linha[0]:
+                    precos[pos] = np.nan if linha[1] is None else linha[1]
+                    categorias[pos] = SEM_CATEGORIA if linha[2] is None else linha[2] + 1
+                else:
+                    novos.append(linha)
+            if novos:
+                n_ids, n_precos, n_categorias = self._arrays(novos)
+                ids = np.concatenate([ids, n_ids])
+                precos = np.concatenate([precos, n_precos])
+                categorias = np.concatenate([categorias, n_categorias])
+                ordem = np.argsort(ids, kind="stable")
+                ids, precos, categorias = ids[ordem], precos[ordem], categorias[ordem]
+            self.ids, self.precos, self.categorias, self.seq = ids, precos, categorias, maior
+
+    def podar(self, conn, a_cada=PODAR_A_CADA):
+        """Apaga do log as alterações já aplicadas; retorna quantas linhas apagou.
+
+        ``conn`` precisa poder escrever (não use a conexão de leitura).
+        """
+        with self._lock:
+            seq = self.seq
+        if seq - self._podado < a_cada:
+            return 0
+        with conn:
+            apagadas = conn.execute("DELETE FROM produtos_alteracoes WHERE seq <= ?", (seq,)).rowcount
+        self._podado = seq
+        return apagadas
+
+    # --- Consulta ---
+
+    def contar(self, min_price, max_price, categoria_id=None, ids_busca=None):
+        """Retorna ``(por_categoria, por_faixa)`` para os filtros informados.
+
+        ``por_categoria`` mapeia categoria_id (``None`` = sem categoria) para a
+        contagem; ``por_faixa`` é uma lista ``[(inicio, fim, contagem), ...]``.
+        ``ids_busca`` (ids que casam com a busca por texto) restringe ambas.
+        """
+        with self._lock:
+            ids, precos, categorias = self.ids, self.precos, self.categorias
+
+        base = ~np.isnan(precos)
+        if ids_busca is not None:
+            base &= np.isin(ids, np.asarray(ids_busca, dtype=np.int64), assume_unique=True)
+
+        no_preco = base & (precos >= min_price) & (precos <= max_price)
+        contagens = np.bincount(categorias[no_preco])
+        por_categoria = {
+            (None if indice == SEM_CATEGORIA else int(indice) - 1): int(qtd)
+            for indice, qtd in enumerate(contagens) if qtd
+        }
+
+        na_categoria = base
+        if categoria_id is not None:
+            na_categoria = base & (categorias == categoria_id + 1)
+        faixa = np.searchsorted(self.faixas, precos[na_categoria], side="right") - 1
+        por_faixa_array = np.bincount(faixa[faixa >= 0], minlength=len(self.faixas))
+        limites = list(self.faixas) + [float("inf")]
+        por_faixa = [(limites[i], limites[i + 1], int(por_faixa_array[i])) for i in range(len(self.faixas))]
+        return por_categoria, por_faixa
+
+
+def ids_da_busca(cursor, expressao):
+    """Ids (array ``int64``) dos produtos que casam com a expressão FTS.
+
+    ``expressao`` vem de ``catalogo.expressao_busca``. O array ocupa 8 bytes
+    por id, contra ~36 de uma lista de ``int``.
+    """
+    return np.fromiter((l[0] for l in cursor.execute(
+        "SELECT rowid FROM produtos_fts WHERE produtos_fts MATCH ?", (expressao,)
+    )), dtype=np.int64)
@@ -0,0 +1,171 @@
+"""Miniaturas das imagens de produtos com cache em disco.
+
+As imagens originais são redimensionadas para as larguras usadas na
+interface (``TAMANHOS``) e recomprimidas em WebP (ou JPEG, se o Pillow não
+tiver suporte a WebP). As miniaturas ficam em ``images/.miniaturas`` com nome
+derivado do hash do conteúdo da original, da largura e do formato; o
+diretório tem tamanho máximo e as miniaturas mais antigas são removidas
+primeiro.
+
+Pré-geração em lote (ex.: após importar um catálogo), em vários processos:
+``python imagens.py ecommerce.db``.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from PIL import Image, features
+
+IMAGES_DIR = "images"
+CACHE_DIR = os.path.join(IMAGES_DIR, ".miniaturas")
+TAMANHOS = (150, 100)  # cards do catálogo e abas de Destaques
+MAX_BYTES_CACHE = int(os.getenv("MINIATURAS_MAX_BYTES", 256 * 1024 * 1024))
+QUALIDADE = 80
+
+FORMATO = "WEBP" if features.check("webp") else "JPEG"
+_EXTENSAO = {"WEBP": "webp", "JPEG": "jpg"}[FORMATO]
+
+_lock_limpeza = threading.Lock()
+_bytes_cache = None  # tamanho estimado do diretório neste processo (None = ainda não medido)
+FRACAO_APOS_LIMPEZA = 0.9  # a limpeza deixa folga para não varrer a cada nova miniatura
+
+
+@lru_cache(maxsize=4096)
+def _hash_conteudo(caminho, mtime_ns, tamanho):
+    # mtime/tamanho na chave: o hash só é recalculado se o arquivo mudar
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def caminho_miniatura(caminho, largura):
+    info = os.stat(caminho)
+    digest = _hash_conteudo(caminho, info.st_mtime_ns, info.st_size)
+    return os.path.join(CACHE_DIR, digest[:2], f"{digest}_{largura}.{_EXTENSAO}")
+
+
+def gerar(caminho, largura, limpar=True):
+    """Gera (se preciso) a miniatura e retorna o caminho dela.
+
+    Com ``limpar=False`` o limite do cache não é verificado (a pré-geração
+    em lote limpa uma vez só, no fim).
+    """
+    destino = caminho_miniatura(caminho, largura)
+    if os.path.exists(destino):
+        return destino
+
+    with Image.open(caminho) as img:
+        img.thumbnail((largura, largura * 4))
+        if FORMATO == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, FORMATO, quality=QUALIDADE, optimize=True)
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(temporario, destino)  # escrita atômica
+    if limpar:
+        _contabilizar(len(buffer.getvalue()))
+    return destino
+
+
+def _contabilizar(tamanho, max_bytes=MAX_BYTES_CACHE):
+    """Soma ``tamanho`` à estimativa e só varre o diretório quando ela passa do limite."""
+    global _bytes_cache
+    if _bytes_cache is None:
+        limitar_cache(max_bytes)  # primeira medição, já inclui a miniatura nova
+        return
+    with _lock_limpeza:
+        if _bytes_cache is not None:
+            _bytes_cache += tamanho
+        estourou = _bytes_cache is not None and _bytes_cache > max_bytes
+    if estourou:
+        limitar_cache(max_bytes)
+
+
+@lru_cache(maxsize=512)
+def _bytes_miniatura(caminho, mtime_ns, largura):
+    with open(gerar(caminho, largura), "rb") as f:
+        return f.read()
+
+
+def miniatura(caminho, largura):
+    """Bytes da miniatura de ``caminho`` ou ``None`` se a imagem não existir ou for inválida."""
+    if not caminho:
+        return None
+    try:
+        return _bytes_miniatura(caminho, os.stat(caminho).st_mtime_ns, largura)
+    except (OSError, Image.UnidentifiedImageError):
+        return None
+
+
+def limitar_cache(max_bytes=MAX_BYTES_CACHE):
+    """Remove as miniaturas mais antigas até o diretório caber em ``max_bytes``.
+
+    Varre o diretório inteiro; se passar do limite, remove até sobrar
+    ``FRACAO_APOS_LIMPEZA`` dele.
+    """
+    global _bytes_cache
+    if not _lock_limpeza.acquire(blocking=False):
+        return  # outra thread já está limpando
+    try:
+        arquivos = []
+        for raiz, _, nomes in os.walk(CACHE_DIR):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                arquivos.append((info.st_mtime, info.st_size, caminho))
+
+        total = sum(a[1] for a in arquivos)
+        alvo = max_bytes * FRACAO_APOS_LIMPEZA if total > max_bytes else max_bytes
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+        _bytes_cache = total
+    finally:
+        _lock_limpeza.release()
+
+
+def _gerar_todas(caminho):
+    gerados = 0
+    for largura in TAMANHOS:
+        try:
+            gerar(caminho, largura, limpar=False)
+            gerados += 1
+        except (OSError, Image.UnidentifiedImageError):
+            pass
+    return gerados
+
+
+def pre_gerar(caminhos, processos=None):
+    """Gera as miniaturas de todos os ``caminhos`` em um pool de processos."""
+    caminhos = sorted({c for c in caminhos if c and os.path.exists(c)})
+    try:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            return sum(pool.map(_gerar_todas, caminhos, chunksize=16))
+    finally:
+        limitar_cache()
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else "ecommerce.db")
+    caminhos = [linha[0] for linha in conn.execute("SELECT DISTINCT imagem_url FROM produtos WHERE imagem_url IS NOT NULL")]
+    conn.close()
+    print(f"{pre_gerar(caminhos)} miniatura(s) gerada(s) para {len(caminhos)} imagem(ns)")
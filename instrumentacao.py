@@ -0,0 +1,231 @@
+"""Medição de tempo por seção da página e por consulta SQL.
+
+``ConexaoInstrumentada`` envolve a conexão SQLite e registra, para cada
+comando (SQL normalizado), número de chamadas, linhas lidas e tempo gasto no
+``execute`` e nos ``fetch``. ``Perfil`` agrupa essas medições com o tempo de
+cada seção nomeada do ``app.py`` em uma execução do script.
+
+Ao final de cada execução o perfil é somado às estatísticas do processo e,
+se ``INSTRUMENTACAO_ARQUIVO`` estiver definido, gravado como uma linha JSON.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+ARQUIVO = os.getenv("INSTRUMENTACAO_ARQUIVO")
+# Desligada por padrão em produção (custo por comando SQL); INSTRUMENTACAO=1 liga,
+# e definir INSTRUMENTACAO_ARQUIVO também liga
+ATIVA = os.getenv("INSTRUMENTACAO", "1" if ARQUIVO else "0") != "0"
+TAMANHO_BLOCO = 256  # linhas por leitura ao iterar um cursor instrumentado
+LIMITE_REPETICOES = 10  # mesma consulta mais vezes que isso em uma execução: possível N+1
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar(sql):
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+class EstatisticaConsulta:
+    __slots__ = ("chamadas", "linhas", "segundos", "maximo")
+
+    def __init__(self):
+        self.chamadas = 0
+        self.linhas = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+
+    def somar(self, outra):
+        self.chamadas += outra.chamadas
+        self.linhas += outra.linhas
+        self.segundos += outra.segundos
+        self.maximo = max(self.maximo, outra.maximo)
+
+    def como_dict(self, sql):
+        return {
+            "sql": sql,
+            "chamadas": self.chamadas,
+            "linhas": self.linhas,
+            "total_ms": round(self.segundos * 1000, 3),
+            "max_ms": round(self.maximo * 1000, 3),
+        }
+
+
+class Perfil:
+    """Medições de uma execução do script."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = {}
+        self.secoes = {}
+        self._secao_atual = None
+        self._inicio_secao = None
+
+    def registrar(self, sql, segundos, linhas=0, nova_chamada=True):
+        estatistica = self.consultas.get(sql)
+        if estatistica is None:
+            estatistica = self.consultas[sql] = EstatisticaConsulta()
+        if nova_chamada:
+            estatistica.chamadas += 1
+        estatistica.linhas += linhas
+        estatistica.segundos += segundos
+        estatistica.maximo = max(estatistica.maximo, segundos)
+
+    def marcar(self, secao):
+        """Encerra a seção atual e inicia ``secao`` (o script roda de cima para baixo)."""
+        agora = time.perf_counter()
+        if self._secao_atual is not None:
+            self.secoes[self._secao_atual] = self.secoes.get(self._secao_atual, 0.0) + agora - self._inicio_secao
+        self._secao_atual = secao
+        self._inicio_secao = agora
+
+    def medir(self, secao, funcao, *args, **kwargs):
+        """Chama ``funcao`` somando seu tempo em ``secao`` (além da seção atual)."""
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            self.secoes[secao] = self.secoes.get(secao, 0.0) + time.perf_counter() - inicio
+
+    def possiveis_n_mais_1(self):
+        return [sql for sql, e in self.consultas.items() if e.chamadas > LIMITE_REPETICOES]
+
+    def como_dict(self):
+        return {
+            "timestamp": time.time(),
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 3),
+            "secoes_ms": {nome: round(s * 1000, 3) for nome, s in self.secoes.items()},
+            "consultas": sorted(
+                (e.como_dict(sql) for sql, e in self.consultas.items()),
+                key=lambda c: c["total_ms"], reverse=True
+            ),
+            "possiveis_n_mais_1": self.possiveis_n_mais_1(),
+        }
+
+
+class EstatisticasProcesso:
+    """Acumulado de todas as execuções do processo (todas as sessões)."""
+
+    def __init__(self, arquivo=ARQUIVO):
+        self.arquivo = arquivo
+        self.execucoes = 0
+        self.consultas = {}
+        self.secoes = {}
+        self._lock = threading.Lock()
+
+    def finalizar(self, perfil):
+        perfil.marcar(None)
+        registro = perfil.como_dict()
+        with self._lock:
+            self.execucoes += 1
+            for sql, estatistica in perfil.consultas.items():
+                self.consultas.setdefault(sql, EstatisticaConsulta()).somar(estatistica)
+            for nome, segundos in perfil.secoes.items():
+                self.secoes[nome] = self.secoes.get(nome, 0.0) + segundos
+            if self.arquivo:
+                with open(self.arquivo, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        return registro
+
+    def resumo(self, limite=20):
+        with self._lock:
+            n = max(self.execucoes, 1)
+            return {
+                "execucoes": self.execucoes,
+                "secoes_media_ms": {nome: round(s * 1000 / n, 3) for nome, s in self.secoes.items()},
+                "consultas": sorted(
+                    (e.como_dict(sql) for sql, e in self.consultas.items()),
+                    key=lambda c: c["total_ms"], reverse=True
+                )[:limite],
+            }
+
+
+class CursorInstrumentado:
+    def __init__(self, cursor, perfil):
+        self._cursor = cursor
+        self._perfil = perfil
+        self._sql = None
+
+    def _medir(self, sql, funcao, *args):
+        inicio = time.perf_counter()
+        try:
+            funcao(*args)
+        finally:
+            self._sql = normalizar(sql)
+            self._perfil.registrar(self._sql, time.perf_counter() - inicio)
+        return self
+
+    def execute(self, sql, params=()):
+        return self._medir(sql, self._cursor.execute, sql, params)
+
+    def executemany(self, sql, params):
+        return self._medir(sql, self._cursor.executemany, sql, params)
+
+    def executescript(self, sql):
+        return self._medir(sql, self._cursor.executescript, sql)
+
+    def _buscar(self, funcao, *args):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        linhas = len(resultado) if isinstance(resultado, list) else int(resultado is not None)
+        if self._sql is not None:
+            self._perfil.registrar(self._sql, time.perf_counter() - inicio, linhas, nova_chamada=False)
+        return resultado
+
+    def fetchone(self):
+        return self._buscar(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._buscar(self._cursor.fetchall)
+
+    def fetchmany(self, tamanho=None):
+        return self._buscar(self._cursor.fetchmany, tamanho or self._cursor.arraysize)
+
+    def __iter__(self):
+        # Lê do cursor real em blocos, medindo por bloco e registrando uma vez só no fim
+        linhas = 0
+        segundos = 0.0
+        try:
+            while True:
+                inicio = time.perf_counter()
+                bloco = self._cursor.fetchmany(TAMANHO_BLOCO)
+                segundos += time.perf_counter() - inicio
+                if not bloco:
+                    return
+                linhas += len(bloco)
+                yield from bloco
+        finally:
+            if self._sql is not None:
+                self._perfil.registrar(self._sql, segundos, linhas, nova_chamada=False)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoInstrumentada:
+    """Repassa tudo para a conexão real, medindo os comandos SQL."""
+
+    def __init__(self, conn, perfil):
+        self._conn = conn
+        self._perfil = perfil
+
+    def cursor(self):
+        return CursorInstrumentado(self._conn.cursor(), self._perfil)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, params):
+        return self.cursor().executemany(sql, params)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
@@ -0,0 +1,482 @@
+"""Migrações versionadas do schema do banco.
+
+A versão aplicada fica em ``PRAGMA user_version``. Cada migração roda em sua
+própria transação (``BEGIN IMMEDIATE``) junto com a atualização da versão, de
+modo que uma falha no meio não deixa o schema pela metade. Com o banco em
+dia, ``migrar`` custa apenas uma leitura de pragma.
+
+Para adicionar uma migração, crie uma função ``_mNNN_descricao(cursor)`` e
+inclua-a no final de ``MIGRACOES``; nunca altere migrações já publicadas.
+Depois regenere ``produtos.sql`` com ``python migracoes.py --dump produtos.sql``.
+"""
+import sqlite3
+import sys
+
+
+def _m001_schema_inicial(cursor):
+    # IF NOT EXISTS: bancos criados antes das migrações já têm as tabelas
+    for sql in (
+        '''CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            senha_hash TEXT NOT NULL,
+            is_admin INTEGER DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS categorias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT UNIQUE NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            descricao TEXT,
+            preco REAL,
+            imagem_url TEXT,
+            categoria_id INTEGER,
+            media_avaliacoes REAL DEFAULT 0,
+            total_avaliacoes INTEGER DEFAULT 0,
+            FOREIGN KEY(categoria_id) REFERENCES categorias(id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS carrinho (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            produto_id INTEGER,
+            quantidade INTEGER DEFAULT 1,
+            data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id),
+            FOREIGN KEY(produto_id) REFERENCES produtos(id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            data_pedido DATETIME DEFAULT CURRENT_TIMESTAMP,
+            total REAL,
+            status TEXT DEFAULT 'pendente',
+            payment_intent TEXT,
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS itens_pedido (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER,
+            produto_id INTEGER,
+            quantidade INTEGER,
+            preco_unitario REAL,
+            FOREIGN KEY(pedido_id) REFERENCES pedidos(id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS avaliacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            produto_id INTEGER,
+            nota INTEGER,
+            comentario TEXT,
+            data_avaliacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id),
+            FOREIGN KEY(produto_id) REFERENCES produtos(id)
+        )''',
+    ):
+        cursor.execute(sql)
+
+
+def _m002_preco_promocional(cursor):
+    colunas = [c[1] for c in cursor.execute("PRAGMA table_info(produtos)")]
+    if "preco_promocional" not in colunas:
+        cursor.execute("ALTER TABLE produtos ADD COLUMN preco_promocional REAL DEFAULT 0")
+
+
+def _m003_produto_exemplo(cursor):
+    # Popula dados de exemplo (apague em produção). Antes rodava a cada
+    # rerun e, sem UNIQUE em nome, duplicava o produto a cada execução.
+    if not cursor.execute("SELECT 1 FROM produtos WHERE nome = 'Smartphone X'").fetchone():
+        cursor.execute('''
+            INSERT INTO produtos (nome, descricao, preco, preco_promocional)
+            VALUES ('Smartphone X', 'Celular de última geração', 1999.99, 1799.99)
+        ''')
+
+
+def _m004_indices(cursor):
+    # Índices desenhados a partir das consultas do app.py e catalogo.py.
+    # categorias.nome já é coberto pelo índice automático do UNIQUE.
+    for sql in (
+        # Catálogo: filtro/ordem por preço (keyset em (preco, id)) e Melhores Preços
+        "CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos(preco)",
+        # Catálogo filtrado por categoria, já ordenado por preço
+        "CREATE INDEX IF NOT EXISTS idx_produtos_categoria_preco ON produtos(categoria_id, preco)",
+        # Melhores Avaliados: percorre em ordem de média e filtra o total no índice
+        "CREATE INDEX IF NOT EXISTS idx_produtos_avaliacao "
+        "ON produtos(media_avaliacoes, total_avaliacoes)",
+        # Promoções: índice parcial sobre o valor do desconto
+        "CREATE INDEX IF NOT EXISTS idx_produtos_desconto "
+        "ON produtos((preco - preco_promocional)) "
+        "WHERE preco_promocional > 0 AND preco_promocional < preco",
+        # Carrinho do usuário (cobre produto e quantidade)
+        "CREATE INDEX IF NOT EXISTS idx_carrinho_usuario "
+        "ON carrinho(usuario_id, produto_id, quantidade)",
+        # Meus Pedidos, já na ordem de data
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_usuario_data ON pedidos(usuario_id, data_pedido)",
+        # Itens de um pedido
+        "CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido(pedido_id)",
+        # Mais Vendidos (índice de cobertura) e verificação de compra para avaliar
+        "CREATE INDEX IF NOT EXISTS idx_itens_pedido_produto "
+        "ON itens_pedido(produto_id, quantidade, pedido_id)",
+        # Verificação de avaliação existente
+        "CREATE INDEX IF NOT EXISTS idx_avaliacoes_usuario_produto "
+        "ON avaliacoes(usuario_id, produto_id)",
+    ):
+        cursor.execute(sql)
+
+
+def _m005_busca_fts(cursor):
+    # Índice de texto completo sobre nome e descrição, sem acentos
+    # ("Último" encontra "ultimo") e mantido em sincronia por triggers
+    for sql in (
+        """CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+            nome, descricao,
+            content='produtos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts(rowid, nome, descricao)
+            VALUES (new.id, new.nome, new.descricao);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome, descricao)
+            VALUES ('delete', old.id, old.nome, old.descricao);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS produtos_fts_au AFTER UPDATE OF nome, descricao ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome, descricao)
+            VALUES ('delete', old.id, old.nome, old.descricao);
+            INSERT INTO produtos_fts(rowid, nome, descricao)
+            VALUES (new.id, new.nome, new.descricao);
+        END""",
+        "INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild')",
+    ):
+        cursor.execute(sql)
+
+
+def _m006_destaques(cursor):
+    # Mais Vendidos: total vendido por produto mantido por triggers em
+    # itens_pedido; o top 5 vira uma leitura em ordem do índice
+    for sql in (
+        """CREATE TABLE IF NOT EXISTS vendas_produto (
+            produto_id INTEGER PRIMARY KEY,
+            total_vendido INTEGER NOT NULL DEFAULT 0
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_vendas_produto_total ON vendas_produto(total_vendido)",
+        """CREATE TRIGGER IF NOT EXISTS vendas_produto_ai AFTER INSERT ON itens_pedido
+        WHEN new.produto_id IS NOT NULL BEGIN
+            INSERT INTO vendas_produto (produto_id, total_vendido)
+            VALUES (new.produto_id, new.quantidade)
+            ON CONFLICT(produto_id) DO UPDATE SET total_vendido = total_vendido + excluded.total_vendido;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS vendas_produto_ad AFTER DELETE ON itens_pedido
+        WHEN old.produto_id IS NOT NULL BEGIN
+            UPDATE vendas_produto SET total_vendido = total_vendido - old.quantidade
+            WHERE produto_id = old.produto_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS vendas_produto_au AFTER UPDATE OF produto_id, quantidade ON itens_pedido
+        BEGIN
+            UPDATE vendas_produto SET total_vendido = total_vendido - old.quantidade
+            WHERE produto_id = old.produto_id;
+            INSERT INTO vendas_produto (produto_id, total_vendido)
+            SELECT new.produto_id, new.quantidade WHERE new.produto_id IS NOT NULL
+            ON CONFLICT(produto_id) DO UPDATE SET total_vendido = total_vendido + excluded.total_vendido;
+        END""",
+        """INSERT OR REPLACE INTO vendas_produto (produto_id, total_vendido)
+        SELECT produto_id, SUM(quantidade) FROM itens_pedido
+        WHERE produto_id IS NOT NULL GROUP BY produto_id""",
+        # Melhores Avaliados: índice parcial só com produtos elegíveis
+        "DROP INDEX IF EXISTS idx_produtos_avaliacao",
+        "CREATE INDEX IF NOT EXISTS idx_produtos_melhores_avaliados "
+        "ON produtos(media_avaliacoes) WHERE total_avaliacoes >= 5",
+    ):
+        cursor.execute(sql)
+
+
+def _m007_idempotencia_pedidos(cursor):
+    # Evita pedidos duplicados por clique duplo ou nova tentativa no checkout
+    colunas = [c[1] for c in cursor.execute("PRAGMA table_info(pedidos)")]
+    if "chave_idempotencia" not in colunas:
+        cursor.execute("ALTER TABLE pedidos ADD COLUMN chave_idempotencia TEXT")
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_pedidos_chave_idempotencia "
+        "ON pedidos(chave_idempotencia)"
+    )
+
+
+def _m008_fila_pagamentos(cursor):
+    # Outbox dos intents de pagamento, drenada por pagamentos.ProcessadorPagamentos
+    cursor.execute("""CREATE TABLE IF NOT EXISTS pagamentos_pendentes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pedido_id INTEGER UNIQUE NOT NULL,
+        valor REAL NOT NULL,
+        descricao TEXT,
+        chave_idempotencia TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pendente',
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        proxima_tentativa REAL NOT NULL,
+        erro TEXT,
+        criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(pedido_id) REFERENCES pedidos(id)
+    )""")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pagamentos_pendentes_fila "
+        "ON pagamentos_pendentes(status, proxima_tentativa)"
+    )
+
+
+def _resumo_avaliacao(linha, sinal):
+    """SQL que soma (sinal=1) ou subtrai (sinal=-1) a avaliação ``linha`` (new/old)."""
+    estrelas = ", ".join(f"({linha}.nota = {n})" for n in range(1, 6))
+    return f"""
+        INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+        SELECT {linha}.produto_id, {sinal} * {linha}.nota, {sinal}, {estrelas}
+        WHERE {linha}.produto_id IS NOT NULL
+        ON CONFLICT(produto_id) DO UPDATE SET
+            soma = soma + excluded.soma,
+            total = total + excluded.total,
+            n1 = n1 + {sinal} * excluded.n1, n2 = n2 + {sinal} * excluded.n2,
+            n3 = n3 + {sinal} * excluded.n3, n4 = n4 + {sinal} * excluded.n4,
+            n5 = n5 + {sinal} * excluded.n5;
+        UPDATE produtos SET
+            total_avaliacoes = r.total,
+            media_avaliacoes = CASE WHEN r.total > 0 THEN r.soma * 1.0 / r.total ELSE 0 END
+        FROM avaliacoes_resumo r
+        WHERE r.produto_id = {linha}.produto_id AND produtos.id = r.produto_id;
+    """
+
+
+def _m009_resumo_avaliacoes(cursor):
+    # Soma, total e histograma de notas por produto mantidos por triggers:
+    # cada avaliação custa O(1) em vez de reler todas as do produto
+    cursor.execute("""CREATE TABLE IF NOT EXISTS avaliacoes_resumo (
+        produto_id INTEGER PRIMARY KEY,
+        soma INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        n1 INTEGER NOT NULL DEFAULT 0,
+        n2 INTEGER NOT NULL DEFAULT 0,
+        n3 INTEGER NOT NULL DEFAULT 0,
+        n4 INTEGER NOT NULL DEFAULT 0,
+        n5 INTEGER NOT NULL DEFAULT 0
+    )""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS avaliacoes_resumo_ai AFTER INSERT ON avaliacoes BEGIN
+        {_resumo_avaliacao("new", 1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS avaliacoes_resumo_ad AFTER DELETE ON avaliacoes BEGIN
+        {_resumo_avaliacao("old", -1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS avaliacoes_resumo_au AFTER UPDATE OF produto_id, nota ON avaliacoes BEGIN
+        {_resumo_avaliacao("old", -1)}
+        {_resumo_avaliacao("new", 1)}
+    END""")
+    cursor.execute("DELETE FROM avaliacoes_resumo")
+    cursor.execute("""
+        INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+        SELECT produto_id, SUM(nota), COUNT(*),
+               SUM(nota = 1), SUM(nota = 2), SUM(nota = 3), SUM(nota = 4), SUM(nota = 5)
+        FROM avaliacoes WHERE produto_id IS NOT NULL GROUP BY produto_id
+    """)
+    cursor.execute("""
+        UPDATE produtos SET
+            total_avaliacoes = COALESCE((SELECT total FROM avaliacoes_resumo WHERE produto_id = produtos.id), 0),
+            media_avaliacoes = COALESCE((SELECT soma * 1.0 / total FROM avaliacoes_resumo
+                                         WHERE produto_id = produtos.id AND total > 0), 0)
+    """)
+
+
+def _m010_sku_produtos(cursor):
+    # Chave natural para o upsert da importação em massa (NULLs não conflitam)
+    colunas = [c[1] for c in cursor.execute("PRAGMA table_info(produtos)")]
+    if "sku" not in colunas:
+        cursor.execute("ALTER TABLE produtos ADD COLUMN sku TEXT")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_sku ON produtos(sku)")
+
+
+def _m011_carrinho_unico(cursor):
+    # Um item por produto no carrinho: junta as linhas duplicadas somando as
+    # quantidades e passa a exigir (usuario_id, produto_id) único para o upsert
+    cursor.execute("""
+        UPDATE carrinho SET quantidade = (
+            SELECT SUM(c2.quantidade) FROM carrinho c2
+            WHERE c2.usuario_id = carrinho.usuario_id AND c2.produto_id = carrinho.produto_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM carrinho GROUP BY usuario_id, produto_id HAVING COUNT(*) > 1)
+    """)
+    cursor.execute("""
+        DELETE FROM carrinho
+        WHERE id NOT IN (SELECT MIN(id) FROM carrinho GROUP BY usuario_id, produto_id)
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_carrinho_usuario_produto ON carrinho(usuario_id, produto_id)"
+    )
+
+
+def _m012_log_alteracoes_produtos(cursor):
+    # Log de produtos alterados (preço/categoria), lido por facetas.py para
+    # atualizar o índice em memória sem reler a tabela inteira
+    cursor.execute("""CREATE TABLE IF NOT EXISTS produtos_alteracoes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto_id INTEGER NOT NULL
+    )""")
+    for nome, evento, linha in (
+        ("ai", "INSERT", "new"),
+        ("au", "UPDATE OF preco, categoria_id", "new"),
+        ("ad", "DELETE", "old"),
+    ):
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS produtos_alteracoes_{nome} AFTER {evento} ON produtos BEGIN
+            INSERT INTO produtos_alteracoes (produto_id) VALUES ({linha}.id);
+        END""")
+
+
+def _venda_diaria(linha, sinal):
+    """SQL que soma (sinal=1) ou subtrai (sinal=-1) o item ``linha`` (new/old) do rollup diário."""
+    return f"""
+        INSERT INTO vendas_diarias (dia, produto_id, categoria_id, receita, unidades, pedidos)
+        SELECT date(p.data_pedido), {linha}.produto_id,
+               (SELECT categoria_id FROM produtos WHERE id = {linha}.produto_id),
+               {sinal} * {linha}.quantidade * {linha}.preco_unitario, {sinal} * {linha}.quantidade, {sinal}
+        FROM pedidos p
+        WHERE p.id = {linha}.pedido_id AND {linha}.produto_id IS NOT NULL
+        ON CONFLICT(dia, produto_id) DO UPDATE SET
+            receita = receita + excluded.receita,
+            unidades = unidades + excluded.unidades,
+            pedidos = pedidos + excluded.pedidos;
+    """
+
+
+def _pedido_diario(linha, sinal):
+    return f"""
+        INSERT INTO pedidos_diarios (dia, pedidos, receita)
+        VALUES (date({linha}.data_pedido), {sinal}, {sinal} * COALESCE({linha}.total, 0))
+        ON CONFLICT(dia) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            receita = receita + excluded.receita;
+    """
+
+
+def _m013_rollups_vendas(cursor):
+    # Receita, unidades e pedidos por produto/dia e pedidos por dia, mantidos
+    # por triggers: os relatórios (relatorios.py) leem só os rollups, nunca o
+    # histórico completo de pedidos. A categoria é a do produto na venda.
+    cursor.execute("""CREATE TABLE IF NOT EXISTS vendas_diarias (
+        dia TEXT NOT NULL,
+        produto_id INTEGER NOT NULL,
+        categoria_id INTEGER,
+        receita REAL NOT NULL DEFAULT 0,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, produto_id)
+    ) WITHOUT ROWID""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS pedidos_diarios (
+        dia TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS vendas_diarias_ai AFTER INSERT ON itens_pedido BEGIN
+        {_venda_diaria("new", 1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS vendas_diarias_ad AFTER DELETE ON itens_pedido BEGIN
+        {_venda_diaria("old", -1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS vendas_diarias_au
+    AFTER UPDATE OF produto_id, quantidade, preco_unitario ON itens_pedido BEGIN
+        {_venda_diaria("old", -1)}
+        {_venda_diaria("new", 1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS pedidos_diarios_ai AFTER INSERT ON pedidos BEGIN
+        {_pedido_diario("new", 1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS pedidos_diarios_ad AFTER DELETE ON pedidos BEGIN
+        {_pedido_diario("old", -1)}
+    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS pedidos_diarios_au AFTER UPDATE OF data_pedido, total ON pedidos BEGIN
+        {_pedido_diario("old", -1)}
+        {_pedido_diario("new", 1)}
+    END""")
+    cursor.execute("DELETE FROM vendas_diarias")
+    cursor.execute("""
+        INSERT INTO vendas_diarias (dia, produto_id, categoria_id, receita, unidades, pedidos)
+        SELECT date(p.data_pedido), i.produto_id, pr.categoria_id,
+               SUM(i.quantidade * i.preco_unitario), SUM(i.quantidade), COUNT(*)
+        FROM itens_pedido i
+        JOIN pedidos p ON p.id = i.pedido_id
+        LEFT JOIN produtos pr ON pr.id = i.produto_id
+        WHERE i.produto_id IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    cursor.execute("DELETE FROM pedidos_diarios")
+    cursor.execute("""
+        INSERT INTO pedidos_diarios (dia, pedidos, receita)
+        SELECT date(data_pedido), COUNT(*), SUM(COALESCE(total, 0)) FROM pedidos GROUP BY 1
+    """)
+
+
+MIGRACOES = [
+    _m001_schema_inicial,
+    _m002_preco_promocional,
+    _m003_produto_exemplo,
+    _m004_indices,
+    _m005_busca_fts,
+    _m006_destaques,
+    _m007_idempotencia_pedidos,
+    _m008_fila_pagamentos,
+    _m009_resumo_avaliacoes,
+    _m010_sku_produtos,
+    _m011_carrinho_unico,
+    _m012_log_alteracoes_produtos,
+    _m013_rollups_vendas,
+]
+VERSAO_ATUAL = len(MIGRACOES)
+
+
+def versao(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(conn):
+    """Aplica as migrações pendentes e retorna a versão final do schema."""
+    if versao(conn) >= VERSAO_ATUAL:
+        return VERSAO_ATUAL
+
+    cursor = conn.cursor()
+    while True:
+        # BEGIN IMMEDIATE serializa processos que sobem ao mesmo tempo;
+        # a versão é relida já com o lock de escrita
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            atual = versao(conn)
+            if atual >= VERSAO_ATUAL:
+                conn.commit()
+                return atual
+            MIGRACOES[atual](cursor)
+            cursor.execute(f"PRAGMA user_version = {atual + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def dump_schema():
+    """SQL do schema resultante de todas as migrações (para ``produtos.sql``)."""
+    conn = sqlite3.connect(":memory:")
+    migrar(conn)
+    linhas = conn.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid
+    """).fetchall()
+    conn.close()
+    return "".join(f"{sql};\n\n" for (sql,) in linhas) + f"PRAGMA user_version = {VERSAO_ATUAL};\n"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--dump":
+        with open(sys.argv[2], "w", encoding="utf-8") as f:
+            f.write(dump_schema())
+    elif len(sys.argv) == 2:
+        conn = sqlite3.connect(sys.argv[1])
+        print(f"Schema na versão {migrar(conn)}")
+        conn.close()
+    else:
+        print("Uso: python migracoes.py <banco.db> | --dump <arquivo.sql>")
+        sys.exit(1)
@@ -0,0 +1,285 @@
+"""Fila durável (outbox) e processador assíncrono de intents de pagamento.
+
+O checkout apenas grava uma linha em ``pagamentos_pendentes`` na mesma
+transação do pedido. O ``ProcessadorPagamentos`` reserva as linhas vencidas,
+chama o provedor em um pool de threads com concorrência limitada e timeout, e
+grava o resultado em ``pedidos.payment_intent``/``status``. Falhas são
+repetidas com backoff exponencial; a chave de idempotência do pedido é
+repassada ao provedor, então repetir uma chamada nunca cria dois intents.
+
+Uma linha reservada fica com ``proxima_tentativa`` no futuro (lease): se o
+processo cair no meio, ela volta a ser elegível quando o lease vencer.
+
+Uso: ``python pagamentos.py ecommerce.db [--falso] [--uma-vez]``.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import db
+
+CONCORRENCIA = 4
+TIMEOUT = 15.0         # segundos por chamada ao provedor
+TIMEOUT_CONEXAO = 5.0  # segundos para abrir a conexão HTTP com o provedor
+MAX_TENTATIVAS = 5
+BACKOFF_BASE = 2.0     # segundos; dobra a cada tentativa
+LEASE = 300.0          # segundos até uma reserva abandonada voltar à fila
+INTERVALO = 1.0        # segundos entre varreduras quando a fila está vazia
+
+
+class BackendStripe:
+    def __init__(self, api_key=None, timeout=TIMEOUT):
+        import stripe
+
+        self.stripe = stripe
+        if api_key:
+            stripe.api_key = api_key
+        # O cliente padrão espera até 80 s; com timeout HTTP próprio a thread
+        # do pool é liberada mesmo quando o timeout do processador já venceu
+        stripe.default_http_client = stripe.RequestsClient(timeout=(TIMEOUT_CONEXAO, timeout))
+
+    def criar_intent(self, valor, descricao, chave):
+        intent = self.stripe.PaymentIntent.create(
+            amount=int(round(valor * 100)),
+            currency='brl',
+            payment_method_types=['card'],
+            description=descricao,
+            idempotency_key=chave
+        )
+        return intent['id']
+
+
+class BackendFalso:
+    """Provedor local para testes de carga sem rede.
+
+    Simula latência e falhas aleatórias e respeita a chave de idempotência
+    (a mesma chave devolve sempre o mesmo intent).
+    """
+
+    def __init__(self, latencia=0.05, taxa_falha=0.0, semente=None):
+        self.latencia = latencia
+        self.taxa_falha = taxa_falha
+        self._random = random.Random(semente)
+        self._intents = {}
+        self._lock = threading.Lock()
+        self.chamadas = 0
+
+    def criar_intent(self, valor, descricao, chave):
+        with self._lock:
+            self.chamadas += 1
+            falhar = self._random.random() < self.taxa_falha
+        time.sleep(self.latencia)
+        if falhar:
+            raise ConnectionError("falha simulada do provedor")
+        with self._lock:
+            return self._intents.setdefault(chave, "pi_fake_" + hashlib.sha1(chave.encode()).hexdigest()[:16])
+
+
+def backend_padrao():
+    if os.getenv("PAYMENT_BACKEND") == "falso":
+        return BackendFalso()
+    return BackendStripe(os.getenv("STRIPE_API_KEY"))
+
+
+def enfileirar(cursor, pedido_id, valor, descricao, chave):
+    """Grava o job de pagamento; deve rodar na transação que cria o pedido."""
+    cursor.execute(
+        """INSERT INTO pagamentos_pendentes (pedido_id, valor, descricao, chave_idempotencia, proxima_tentativa)
+           VALUES (?, ?, ?, ?, ?)""",
+        (pedido_id, valor, descricao, chave, time.time())
+    )
+
+
+class ProcessadorPagamentos:
+    def __init__(self, caminho=db.DB_PATH, backend=None, concorrencia=CONCORRENCIA, timeout=TIMEOUT,
+                 max_tentativas=MAX_TENTATIVAS, backoff_base=BACKOFF_BASE, intervalo=INTERVALO):
+        self.caminho = caminho
+        self.backend = backend or backend_padrao()
+        self.concorrencia = concorrencia
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.intervalo = intervalo
+        self._pool = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="pagamento")
+        self._parar = threading.Event()
+        self._thread = None
+        # Chamadas que estouraram o timeout seguem ocupando uma thread do pool
+        # (não dá para interrompê-las); só reservamos jobs para threads livres
+        self._em_andamento = set()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.concluidos = 0
+        self.falhas = 0
+
+    def _conexao(self):
+        # Usada apenas pela thread do despachante
+        if self._conn is None:
+            self._conn = db.configurar(sqlite3.connect(self.caminho, check_same_thread=False))
+        return self._conn
+
+    def _reservar(self, limite):
+        conn = self._conexao()
+        agora = time.time()
+        with conn:
+            return conn.execute(
+                """
+                UPDATE pagamentos_pendentes
+                SET status = 'processando', proxima_tentativa = ?
+                WHERE id IN (
+                    SELECT id FROM pagamentos_pendentes
+                    WHERE status IN ('pendente', 'processando') AND proxima_tentativa <= ?
+                    ORDER BY proxima_tentativa
+                    LIMIT ?
+                )
+                RETURNING id, pedido_id, valor, descricao, chave_idempotencia, tentativas
+                """,
+                (agora + LEASE, agora, limite)
+            ).fetchall()
+
+    def _concluir(self, job, intent_id):
+        conn = self._conexao()
+        with conn:
+            conn.execute(
+                "UPDATE pedidos SET payment_intent = ?, status = 'aguardando_pagamento' WHERE id = ?",
+                (intent_id, job[1])
+            )
+            conn.execute(
+                "UPDATE pagamentos_pendentes SET status = 'concluido', erro = NULL WHERE id = ?",
+                (job[0],)
+            )
+        self.concluidos += 1
+
+    def _devolver(self, job):
+        """Libera a reserva sem contar tentativa (a chamada nem começou)."""
+        conn = self._conexao()
+        with conn:
+            conn.execute(
+                "UPDATE pagamentos_pendentes SET status = 'pendente', proxima_tentativa = ? WHERE id = ?",
+                (time.time(), job[0])
+            )
+
+    def _submeter(self, job):
+        futuro = self._pool.submit(self.backend.criar_intent, job[2], job[3], job[4])
+        with self._lock:
+            self._em_andamento.add(futuro)
+        futuro.add_done_callback(self._terminou)
+        return futuro
+
+    def _terminou(self, futuro):
+        with self._lock:
+            self._em_andamento.discard(futuro)
+
+    def livres(self):
+        """Threads do pool que não estão presas em chamadas anteriores."""
+        with self._lock:
+            return max(self.concorrencia - len(self._em_andamento), 0)
+
+    def _falhar(self, job, erro):
+        tentativas = job[5] + 1
+        conn = self._conexao()
+        with conn:
+            if tentativas >= self.max_tentativas:
+                conn.execute(
+                    "UPDATE pagamentos_pendentes SET status = 'falhou', tentativas = ?, erro = ? WHERE id = ?",
+                    (tentativas, str(erro), job[0])
+                )
+                conn.execute("UPDATE pedidos SET status = 'falha_pagamento' WHERE id = ?", (job[1],))
+            else:
+                espera = self.backoff_base * 2 ** (tentativas - 1) * random.uniform(0.8, 1.2)
+                conn.execute(
+                    """UPDATE pagamentos_pendentes
+                       SET status = 'pendente', tentativas = ?, erro = ?, proxima_tentativa = ?
+                       WHERE id = ?""",
+                    (tentativas, str(erro), time.time() + espera, job[0])
+                )
+        self.falhas += 1
+
+    def processar_lote(self):
+        """Processa até ``livres()`` jobs vencidos; retorna quantos reservou."""
+        livres = self.livres()
+        if not livres:
+            return 0
+        jobs = self._reservar(livres)
+        if not jobs:
+            return 0
+
+        futuros = {self._submeter(job): job for job in jobs}
+        feitos, atrasados = wait(futuros, timeout=self.timeout)
+        for futuro in feitos:
+            erro = futuro.exception()
+            if erro is None:
+                self._concluir(futuros[futuro], futuro.result())
+            else:
+                self._falhar(futuros[futuro], erro)
+        for futuro in atrasados:
+            if futuro.cancel():
+                # Ficou na fila do pool sem chegar ao provedor: não conta tentativa
+                self._devolver(futuros[futuro])
+                continue
+            # A chamada segue na thread, mas a nova tentativa usa a mesma
+            # chave de idempotência e recebe o mesmo intent do provedor
+            self._falhar(futuros[futuro], TimeoutError(f"provedor não respondeu em {self.timeout}s"))
+        return len(jobs)
+
+    def drenar(self):
+        """Processa até não haver jobs vencidos (útil em testes de carga)."""
+        total = 0
+        while True:
+            processados = self.processar_lote()
+            if not processados:
+                return total
+            total += processados
+
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                if not self.processar_lote():
+                    self._parar.wait(self.intervalo)
+            except sqlite3.Error:
+                self._parar.wait(self.intervalo)
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="processador-pagamentos", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+if __name__ == "__main__":
+    import migracoes
+
+    args = sys.argv[1:]
+    caminho = next((a for a in args if not a.startswith("--")), db.DB_PATH)
+    conn = sqlite3.connect(caminho)
+    migracoes.migrar(conn)
+    conn.close()
+
+    processador = ProcessadorPagamentos(caminho, BackendFalso() if "--falso" in args else None)
+    if "--uma-vez" in args:
+        inicio = time.perf_counter()
+        total = processador.drenar()
+        duracao = time.perf_counter() - inicio
+        print(f"{total} job(s) em {duracao:.2f}s: {processador.concluidos} concluídos, {processador.falhas} falhas")
+        processador.parar()
+    else:
+        processador.iniciar()
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            processador.parar()
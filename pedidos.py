@@ -0,0 +1,48 @@
+"""Histórico de pedidos do usuário sem consultas N+1.
+
+Cada página custa duas consultas, independentemente de quantos pedidos o
+cliente tenha: os pedidos da página (keyset em ``data_pedido, id``, do mais
+recente para o mais antigo) e todos os itens desses pedidos em um único
+``IN (...)``, agrupados em Python.
+"""
+PEDIDOS_POR_PAGINA = 10
+
+
+def buscar_historico(cursor, usuario_id, apos=None, limite=PEDIDOS_POR_PAGINA):
+    """Retorna ``[(pedido, itens), ...]`` da página seguinte a ``apos``.
+
+    ``pedido`` mantém o formato de ``SELECT * FROM pedidos``; ``itens`` são
+    tuplas ``(nome, quantidade, preco_unitario)``. ``apos`` é a chave
+    ``(data_pedido, id)`` do último pedido da página anterior.
+    """
+    query = "SELECT * FROM pedidos WHERE usuario_id = ?"
+    params = [usuario_id]
+    if apos is not None:
+        query += " AND (data_pedido, id) < (?, ?)"
+        params.extend(apos)
+    query += " ORDER BY data_pedido DESC, id DESC LIMIT ?"
+    params.append(limite)
+    pedidos = cursor.execute(query, params).fetchall()
+    if not pedidos:
+        return []
+
+    marcadores = ",".join("?" * len(pedidos))
+    itens_por_pedido = {pedido[0]: [] for pedido in pedidos}
+    for pedido_id, nome, quantidade, preco in cursor.execute(
+        f"""
+        SELECT i.pedido_id, p.nome, i.quantidade, i.preco_unitario
+        FROM itens_pedido i
+        JOIN produtos p ON i.produto_id = p.id
+        WHERE i.pedido_id IN ({marcadores})
+        ORDER BY i.pedido_id, i.id
+        """,
+        [pedido[0] for pedido in pedidos]
+    ):
+        itens_por_pedido[pedido_id].append((nome, quantidade, preco))
+
+    return [(pedido, itens_por_pedido[pedido[0]]) for pedido in pedidos]
+
+
+def chave(pedido):
+    """Chave de paginação ``(data_pedido, id)`` de um pedido."""
+    return (pedido[2], pedido[0])
@@ -0,0 +1,143 @@
+"""Verificação de regressão dos planos das consultas quentes.
+
+Roda ``EXPLAIN QUERY PLAN`` em cada consulta usada pelo app e falha se alguma
+delas voltar a fazer ``SCAN`` completo (sem índice) de uma tabela grande.
+Leituras em ordem de índice (``SCAN ... USING INDEX``) são aceitas, pois com
+``LIMIT`` param cedo.
+
+Uso: ``python plano_consultas.py [banco.db]`` (padrão: banco em memória com
+todas as migrações). Código de saída 1 indica regressão.
+"""
+import re
+import sqlite3
+import sys
+
+import catalogo
+import destaques
+import migracoes
+import pedidos
+
+TABELAS_GRANDES = {"produtos", "carrinho", "pedidos", "itens_pedido", "avaliacoes", "usuarios",
+                   "vendas_produto", "vendas_diarias", "pedidos_diarios"}
+
+# nome -> (sql, parâmetros). Consultas do catálogo vêm de catalogo.py.
+CONSULTAS = {
+    "login": ("SELECT * FROM usuarios WHERE email = ?", ("a@b.c",)),
+    "carrinho": ("""
+        SELECT c.produto_id, p.nome, p.preco, c.quantidade, p.imagem_url
+        FROM carrinho c
+        JOIN produtos p ON c.produto_id = p.id
+        WHERE c.usuario_id = ?
+    """, (1,)),
+    "comprou_produto": ("""
+        SELECT 1 FROM itens_pedido
+        JOIN pedidos ON itens_pedido.pedido_id = pedidos.id
+        WHERE pedidos.usuario_id = ? AND itens_pedido.produto_id = ?
+    """, (1, 1)),
+    "lista_avaliacao": ("SELECT id, nome FROM produtos", ()),
+    "histograma_avaliacoes": ("SELECT n1, n2, n3, n4, n5 FROM avaliacoes_resumo WHERE produto_id = ?", (1,)),
+    "ja_avaliou": ("SELECT 1 FROM avaliacoes WHERE usuario_id = ? AND produto_id = ?", (1, 1)),
+    "relatorio_vendas": ("""
+        SELECT dia, produto_id, categoria_id, receita, unidades, pedidos
+        FROM vendas_diarias
+        WHERE dia BETWEEN ? AND ?
+    """, ("2024-01-01", "2024-01-31")),
+    "relatorio_pedidos": ("SELECT dia, pedidos FROM pedidos_diarios WHERE dia BETWEEN ? AND ?",
+                          ("2024-01-01", "2024-01-31")),
+}
+CONSULTAS.update({f"destaques_{nome}": (sql, ()) for nome, sql in destaques.CONSULTAS.items()})
+
+# Consultas que leem a tabela inteira por definição
+SCAN_PERMITIDO = {
+    # lista todos os produtos no selectbox de avaliação
+    "SELECT id, nome FROM produtos",
+}
+
+_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+class _Resultado:
+    """Resultado falso: uma linha de zeros, suficiente para o código seguir."""
+
+    LINHA = (0,) * 16
+
+    def fetchone(self):
+        return self.LINHA
+
+    def fetchall(self):
+        return [self.LINHA]
+
+    def __iter__(self):
+        return iter(())
+
+
+class _Explicador:
+    """Cursor falso que troca cada consulta pelo seu EXPLAIN QUERY PLAN."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.planos = []
+
+    def execute(self, sql, params=()):
+        self.planos.append((sql, self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()))
+        return _Resultado()
+
+
+def _aliases(sql):
+    """Mapeia alias -> tabela (ex.: ``produtos p``) para interpretar o plano."""
+    aliases = {t: t for t in TABELAS_GRANDES}
+    for tabela, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)\s+(?!ON\b|WHERE\b|JOIN\b|LEFT\b)(\w+)", sql, re.I):
+        aliases[alias] = tabela
+    return aliases
+
+
+def planos(conn):
+    """Retorna ``{nome: [(sql, linhas_do_plano), ...]}`` das consultas quentes."""
+    resultado = {}
+    for nome, (sql, params) in CONSULTAS.items():
+        explicador = _Explicador(conn)
+        explicador.execute(sql, params)
+        resultado[nome] = explicador.planos
+
+    explicador = _Explicador(conn)
+    pedidos.buscar_historico(explicador, 1)
+    pedidos.buscar_historico(explicador, 1, apos=("2024-01-01", 1))
+    resultado["meus_pedidos"] = explicador.planos
+
+    filtros = [
+        ("catalogo", catalogo.Filtros(0.0, 10000.0)),
+        ("catalogo_busca", catalogo.Filtros(0.0, 10000.0, "x")),
+        ("catalogo_categoria", catalogo.Filtros(0.0, 10000.0, "", "Eletrônicos")),
+    ]
+    for nome, f in filtros:
+        explicador = _Explicador(conn)
+        catalogo.contar_produtos(explicador, f)
+        catalogo.buscar_pagina(explicador, f)
+        catalogo.buscar_pagina(explicador, f, apos=(10.0, 1))
+        resultado[nome] = explicador.planos
+    return resultado
+
+
+def verificar(conn):
+    """Lista de regressões encontradas (vazia quando tudo usa índice)."""
+    problemas = []
+    for nome, consultas in planos(conn).items():
+        for sql, plano in consultas:
+            if " ".join(sql.split()) in SCAN_PERMITIDO:
+                continue
+            aliases = _aliases(sql)
+            for linha in plano:
+                m = _SCAN.match(linha[3])
+                if m and aliases.get(m.group(1)) in TABELAS_GRANDES:
+                    problemas.append(f"{nome}: {linha[3]}")
+    return problemas
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else ":memory:")
+    migracoes.migrar(conn)
+    problemas = verificar(conn)
+    for problema in problemas:
+        print(f"REGRESSÃO {problema}")
+    print("OK" if not problemas else f"{len(problemas)} consulta(s) com SCAN completo")
+    sys.exit(1 if problemas else 0)
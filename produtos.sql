@@ -1,11 +1,378 @@
+CREATE TABLE usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            senha_hash TEXT NOT NULL,
+            is_admin INTEGER DEFAULT 0
+        );
+
+CREATE TABLE categorias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT UNIQUE NOT NULL
+        );
+
 CREATE TABLE produtos (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    nome TEXT NOT NULL,
-    descricao TEXT,
-    preco REAL,
-    imagem_url TEXT,
-    categoria_id INTEGER,
-    media_avaliacoes REAL DEFAULT 0,
-    total_avaliacoes INTEGER DEFAULT 0,
-    preco_promocional REAL DEFAULT 0
-);
\ No newline at end of file
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            descricao TEXT,
+            preco REAL,
+            imagem_url TEXT,
+            categoria_id INTEGER,
+            media_avaliacoes REAL DEFAULT 0,
+            total_avaliacoes INTEGER DEFAULT 0, preco_promocional REAL DEFAULT 0, sku TEXT,
+            FOREIGN KEY(categoria_id) REFERENCES categorias(id)
+        );
+
+CREATE TABLE carrinho (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            produto_id INTEGER,
+            quantidade INTEGER DEFAULT 1,
+            data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id),
+            FOREIGN KEY(produto_id) REFERENCES produtos(id)
+        );
+
+CREATE TABLE pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            data_pedido DATETIME DEFAULT CURRENT_TIMESTAMP,
+            total REAL,
+            status TEXT DEFAULT 'pendente',
+            payment_intent TEXT, chave_idempotencia TEXT,
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id)
+        );
+
+CREATE TABLE itens_pedido (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER,
+            produto_id INTEGER,
+            quantidade INTEGER,
+            preco_unitario REAL,
+            FOREIGN KEY(pedido_id) REFERENCES pedidos(id)
+        );
+
+CREATE TABLE avaliacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            produto_id INTEGER,
+            nota INTEGER,
+            comentario TEXT,
+            data_avaliacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id),
+            FOREIGN KEY(produto_id) REFERENCES produtos(id)
+        );
+
+CREATE VIRTUAL TABLE produtos_fts USING fts5(
+            nome, descricao,
+            content='produtos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+
+CREATE TABLE 'produtos_fts_data'(id INTEGER PRIMARY KEY, block BLOB);
+
+CREATE TABLE 'produtos_fts_idx'(segid, term, pgno, PRIMARY KEY(segid, term)) WITHOUT ROWID;
+
+CREATE TABLE 'produtos_fts_docsize'(id INTEGER PRIMARY KEY, sz BLOB);
+
+CREATE TABLE 'produtos_fts_config'(k PRIMARY KEY, v) WITHOUT ROWID;
+
+CREATE TABLE vendas_produto (
+            produto_id INTEGER PRIMARY KEY,
+            total_vendido INTEGER NOT NULL DEFAULT 0
+        );
+
+CREATE TABLE pagamentos_pendentes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pedido_id INTEGER UNIQUE NOT NULL,
+        valor REAL NOT NULL,
+        descricao TEXT,
+        chave_idempotencia TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pendente',
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        proxima_tentativa REAL NOT NULL,
+        erro TEXT,
+        criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(pedido_id) REFERENCES pedidos(id)
+    );
+
+CREATE TABLE avaliacoes_resumo (
+        produto_id INTEGER PRIMARY KEY,
+        soma INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        n1 INTEGER NOT NULL DEFAULT 0,
+        n2 INTEGER NOT NULL DEFAULT 0,
+        n3 INTEGER NOT NULL DEFAULT 0,
+        n4 INTEGER NOT NULL DEFAULT 0,
+        n5 INTEGER NOT NULL DEFAULT 0
+    );
+
+CREATE TABLE produtos_alteracoes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto_id INTEGER NOT NULL
+    );
+
+CREATE TABLE vendas_diarias (
+        dia TEXT NOT NULL,
+        produto_id INTEGER NOT NULL,
+        categoria_id INTEGER,
+        receita REAL NOT NULL DEFAULT 0,
+        unidades INTEGER NOT NULL DEFAULT 0,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, produto_id)
+    ) WITHOUT ROWID;
+
+CREATE TABLE pedidos_diarios (
+        dia TEXT PRIMARY KEY,
+        pedidos INTEGER NOT NULL DEFAULT 0,
+        receita REAL NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+
+CREATE INDEX idx_produtos_preco ON produtos(preco);
+
+CREATE INDEX idx_produtos_categoria_preco ON produtos(categoria_id, preco);
+
+CREATE INDEX idx_produtos_desconto ON produtos((preco - preco_promocional)) WHERE preco_promocional > 0 AND preco_promocional < preco;
+
+CREATE INDEX idx_carrinho_usuario ON carrinho(usuario_id, produto_id, quantidade);
+
+CREATE INDEX idx_pedidos_usuario_data ON pedidos(usuario_id, data_pedido);
+
+CREATE INDEX idx_itens_pedido_pedido ON itens_pedido(pedido_id);
+
+CREATE INDEX idx_itens_pedido_produto ON itens_pedido(produto_id, quantidade, pedido_id);
+
+CREATE INDEX idx_avaliacoes_usuario_produto ON avaliacoes(usuario_id, produto_id);
+
+CREATE INDEX idx_vendas_produto_total ON vendas_produto(total_vendido);
+
+CREATE INDEX idx_produtos_melhores_avaliados ON produtos(media_avaliacoes) WHERE total_avaliacoes >= 5;
+
+CREATE UNIQUE INDEX idx_pedidos_chave_idempotencia ON pedidos(chave_idempotencia);
+
+CREATE INDEX idx_pagamentos_pendentes_fila ON pagamentos_pendentes(status, proxima_tentativa);
+
+CREATE UNIQUE INDEX idx_produtos_sku ON produtos(sku);
+
+CREATE UNIQUE INDEX idx_carrinho_usuario_produto ON carrinho(usuario_id, produto_id);
+
+CREATE TRIGGER produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts(rowid, nome, descricao)
+            VALUES (new.id, new.nome, new.descricao);
+        END;
+
+CREATE TRIGGER produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome, descricao)
+            VALUES ('delete', old.id, old.nome, old.descricao);
+        END;
+
+CREATE TRIGGER produtos_fts_au AFTER UPDATE OF nome, descricao ON produtos BEGIN
+            INSERT INTO produtos_fts(produtos_fts, rowid, nome, descricao)
+            VALUES ('delete', old.id, old.nome, old.descricao);
+            INSERT INTO produtos_fts(rowid, nome, descricao)
+            VALUES (new.id, new.nome, new.descricao);
+        END;
+
+CREATE TRIGGER vendas_produto_ai AFTER INSERT ON itens_pedido
+        WHEN new.produto_id IS NOT NULL BEGIN
+            INSERT INTO vendas_produto (produto_id, total_vendido)
+            VALUES (new.produto_id, new.quantidade)
+            ON CONFLICT(produto_id) DO UPDATE SET total_vendido = total_vendido + excluded.total_vendido;
+        END;
+
+CREATE TRIGGER vendas_produto_ad AFTER DELETE ON itens_pedido
+        WHEN old.produto_id IS NOT NULL BEGIN
+            UPDATE vendas_produto SET total_vendido = total_vendido - old.quantidade
+            WHERE produto_id = old.produto_id;
+        END;
+
+CREATE TRIGGER vendas_produto_au AFTER UPDATE OF produto_id, quantidade ON itens_pedido
+        BEGIN
+            UPDATE vendas_produto SET total_vendido = total_vendido - old.quantidade
+            WHERE produto_id = old.produto_id;
+            INSERT INTO vendas_produto (produto_id, total_vendido)
+            SELECT new.produto_id, new.quantidade WHERE new.produto_id IS NOT NULL
+            ON CONFLICT(produto_id) DO UPDATE SET total_vendido = total_vendido + excluded.total_vendido;
+        END;
+
+CREATE TRIGGER avaliacoes_resumo_ai AFTER INSERT ON avaliacoes BEGIN
+        
+        INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+        SELECT new.produto_id, 1 * new.nota, 1, (new.nota = 1), (new.nota = 2), (new.nota = 3), (new.nota = 4), (new.nota = 5)
+        WHERE new.produto_id IS NOT NULL
+        ON CONFLICT(produto_id) DO UPDATE SET
+            soma = soma + excluded.soma,
+            total = total + excluded.total,
+            n1 = n1 + 1 * excluded.n1, n2 = n2 + 1 * excluded.n2,
+            n3 = n3 + 1 * excluded.n3, n4 = n4 + 1 * excluded.n4,
+            n5 = n5 + 1 * excluded.n5;
+        UPDATE produtos SET
+            total_avaliacoes = r.total,
+            media_avaliacoes = CASE WHEN r.total > 0 THEN r.soma * 1.0 / r.total ELSE 0 END
+        FROM avaliacoes_resumo r
+        WHERE r.produto_id = new.produto_id AND produtos.id = r.produto_id;
+    
+    END;
+
+CREATE TRIGGER avaliacoes_resumo_ad AFTER DELETE ON avaliacoes BEGIN
+        
+        INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+        SELECT old.produto_id, -1 * old.nota, -1, (old.nota = 1), (old.nota = 2), (old.nota = 3), (old.nota = 4), (old.nota = 5)
+        WHERE old.produto_id IS NOT NULL
+        ON CONFLICT(produto_id) DO UPDATE SET
+            soma = soma + excluded.soma,
+            total = total + excluded.total,
+            n1 = n1 + -1 * excluded.n1, n2 = n2 + -1 * excluded.n2,
+            n3 = n3 + -1 * excluded.n3, n4 = n4 + -1 * excluded.n4,
+            n5 = n5 + -1 * excluded.n5;
+        UPDATE produtos SET
+            total_avaliacoes = r.total,
+            media_avaliacoes = CASE WHEN r.total > 0 THEN r.soma * 1.0 / r.total ELSE 0 END
+        FROM avaliacoes_resumo r
+        WHERE r.produto_id = old.produto_id AND produtos.id = r.produto_id;
+    
+    END;
+
+CREATE TRIGGER avaliacoes_resumo_au AFTER UPDATE OF produto_id, nota ON avaliacoes BEGIN
+        
+        INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+        SELECT old.produto_id, -1 * old.nota, -1, (old.nota = 1), (old.nota = 2), (old.nota = 3), (old.nota = 4), (old.nota = 5)
+        WHERE old.produto_id IS NOT NULL
+        ON CONFLICT(produto_id) DO UPDATE SET
+            soma = soma + excluded.soma,
+            total = total + excluded.total,
+            n1 = n1 + -1 * excluded.n1, n2 = n2 + -1 * excluded.n2,
+            n3 = n3 + -1 * excluded.n3, n4 = n4 + -1 * excluded.n4,
+            n5 = n5 + -1 * excluded.n5;
+        UPDATE produtos SET
+            total_avaliacoes = r.total,
+            media_avaliacoes = CASE WHEN r.total > 0 THEN r.soma * 1.0 / r.total ELSE 0 END
+        FROM avaliacoes_resumo r
+        WHERE r.produto_id = old.produto_id AND produtos.id = r.produto_id;
+    
+        
+        INSERT INTO avaliacoes_resumo (produto_id, soma, total, n1, n2, n3, n4, n5)
+        SELECT new.produto_id, 1 * new.nota, 1, (new.nota = 1), (new.nota = 2), (new.nota = 3), (new.nota = 4), (new.nota = 5)
+        WHERE new.produto_id IS NOT NULL
+        ON CONFLICT(produto_id) DO UPDATE SET
+            soma = soma + excluded.soma,
+            total = total + excluded.total,
+            n1 = n1 + 1 * excluded.n1, n2 = n2 + 1 * excluded.n2,
+            n3 = n3 + 1 * excluded.n3, n4 = n4 + 1 * excluded.n4,
+            n5 = n5 + 1 * excluded.n5;
+        UPDATE produtos SET
+            total_avaliacoes = r.total,
+            media_avaliacoes = CASE WHEN r.total > 0 THEN r.soma * 1.0 / r.total ELSE 0 END
+        FROM avaliacoes_resumo r
+        WHERE r.produto_id = new.produto_id AND produtos.id = r.produto_id;
+    
+    END;
+
+CREATE TRIGGER produtos_alteracoes_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_alteracoes (produto_id) VALUES (new.id);
+        END;
+
+CREATE TRIGGER produtos_alteracoes_au AFTER UPDATE OF preco, categoria_id ON produtos BEGIN
+            INSERT INTO produtos_alteracoes (produto_id) VALUES (new.id);
+        END;
+
+CREATE TRIGGER produtos_alteracoes_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_alteracoes (produto_id) VALUES (old.id);
+        END;
+
+CREATE TRIGGER vendas_diarias_ai AFTER INSERT ON itens_pedido BEGIN
+        
+        INSERT INTO vendas_diarias (dia, produto_id, categoria_id, receita, unidades, pedidos)
+        SELECT date(p.data_pedido), new.produto_id,
+               (SELECT categoria_id FROM produtos WHERE id = new.produto_id),
+               1 * new.quantidade * new.preco_unitario, 1 * new.quantidade, 1
+        FROM pedidos p
+        WHERE p.id = new.pedido_id AND new.produto_id IS NOT NULL
+        ON CONFLICT(dia, produto_id) DO UPDATE SET
+            receita = receita + excluded.receita,
+            unidades = unidades + excluded.unidades,
+            pedidos = pedidos + excluded.pedidos;
+    
+    END;
+
+CREATE TRIGGER vendas_diarias_ad AFTER DELETE ON itens_pedido BEGIN
+        
+        INSERT INTO vendas_diarias (dia, produto_id, categoria_id, receita, unidades, pedidos)
+        SELECT date(p.data_pedido), old.produto_id,
+               (SELECT categoria_id FROM produtos WHERE id = old.produto_id),
+               -1 * old.quantidade * old.preco_unitario, -1 * old.quantidade, -1
+        FROM pedidos p
+        WHERE p.id = old.pedido_id AND old.produto_id IS NOT NULL
+        ON CONFLICT(dia, produto_id) DO UPDATE SET
+            receita = receita + excluded.receita,
+            unidades = unidades + excluded.unidades,
+            pedidos = pedidos + excluded.pedidos;
+    
+    END;
+
+CREATE TRIGGER vendas_diarias_au
+    AFTER UPDATE OF produto_id, quantidade, preco_unitario ON itens_pedido BEGIN
+        
+        INSERT INTO vendas_diarias (dia, produto_id, categoria_id, receita, unidades, pedidos)
+        SELECT date(p.data_pedido), old.produto_id,
+               (SELECT categoria_id FROM produtos WHERE id = old.produto_id),
+               -1 * old.quantidade * old.preco_unitario, -1 * old.quantidade, -1
+        FROM pedidos p
+        WHERE p.id = old.pedido_id AND old.produto_id IS NOT NULL
+        ON CONFLICT(dia, produto_id) DO UPDATE SET
+            receita = receita + excluded.receita,
+            unidades = unidades + excluded.unidades,
+            pedidos = pedidos + excluded.pedidos;
+    
+        
+        INSERT INTO vendas_diarias (dia, produto_id, categoria_id, receita, unidades, pedidos)
+        SELECT date(p.data_pedido), new.produto_id,
+               (SELECT categoria_id FROM produtos WHERE id = new.produto_id),
+               1 * new.quantidade * new.preco_unitario, 1 * new.quantidade, 1
+        FROM pedidos p
+        WHERE p.id = new.pedido_id AND new.produto_id IS NOT NULL
+        ON CONFLICT(dia, produto_id) DO UPDATE SET
+            receita = receita + excluded.receita,
+            unidades = unidades + excluded.unidades,
+            pedidos = pedidos + excluded.pedidos;
+    
+    END;
+
+CREATE TRIGGER pedidos_diarios_ai AFTER INSERT ON pedidos BEGIN
+        
+        INSERT INTO pedidos_diarios (dia, pedidos, receita)
+        VALUES (date(new.data_pedido), 1, 1 * COALESCE(new.total, 0))
+        ON CONFLICT(dia) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            receita = receita + excluded.receita;
+    
+    END;
+
+CREATE TRIGGER pedidos_diarios_ad AFTER DELETE ON pedidos BEGIN
+        
+        INSERT INTO pedidos_diarios (dia, pedidos, receita)
+        VALUES (date(old.data_pedido), -1, -1 * COALESCE(old.total, 0))
+        ON CONFLICT(dia) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            receita = receita + excluded.receita;
+    
+    END;
+
+CREATE TRIGGER pedidos_diarios_au AFTER UPDATE OF data_pedido, total ON pedidos BEGIN
+        
+        INSERT INTO pedidos_diarios (dia, pedidos, receita)
+        VALUES (date(old.data_pedido), -1, -1 * COALESCE(old.total, 0))
+        ON CONFLICT(dia) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            receita = receita + excluded.receita;
+    
+        
+        INSERT INTO pedidos_diarios (dia, pedidos, receita)
+        VALUES (date(new.data_pedido), 1, 1 * COALESCE(new.total, 0))
+        ON CONFLICT(dia) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            receita = receita + excluded.receita;
+    
+    END;
+
+PRAGMA user_version = 13;
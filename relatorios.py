@@ -0,0 +1,236 @@
+"""Relatórios de vendas para a área administrativa.
+
+Tudo é calculado sobre os rollups diários ``vendas_diarias`` (receita,
+unidades e pedidos por produto/dia) e ``pedidos_diarios`` (pedidos e receita
+por dia), mantidos por triggers a cada pedido criado. Um relatório de 90 dias
+lê no máximo 90 x (produtos vendidos) linhas, independentemente do tamanho do
+histórico de pedidos; as agregações são feitas com pandas/NumPy.
+
+As datas são dias em UTC (``date(data_pedido)`` do SQLite).
+
+Uso:
+    python relatorios.py serie --inicio 2024-01-01 --fim 2024-03-31 [--freq W] [--por categoria]
+    python relatorios.py top --metrica unidades --n 20
+    python relatorios.py comparar --por categoria
+    python relatorios.py exportar vendas.parquet --inicio 2024-01-01
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import db
+import migracoes
+
+METRICAS = ("receita", "unidades", "pedidos")
+AGRUPAMENTOS = {"produto": "produto_id", "categoria": "categoria_id"}
+SEM_CATEGORIA = 0  # categoria_id NULL nos rollups
+TAMANHO_LOTE = 50000
+
+COLUNAS_EXPORTACAO = ("dia", "produto_id", "produto", "categoria", "receita", "unidades", "pedidos")
+
+
+def periodo_padrao(dias=30, hoje=None):
+    """``(inicio, fim)`` dos últimos ``dias`` dias, incluindo hoje (UTC)."""
+    fim = hoje or datetime.now(timezone.utc).date()
+    return fim - timedelta(days=dias - 1), fim
+
+
+def _dia(valor):
+    return valor.isoformat() if isinstance(valor, date) else str(valor)
+
+
+def carregar(cursor, inicio, fim):
+    """Linhas de ``vendas_diarias`` entre ``inicio`` e ``fim`` (inclusive)."""
+    linhas = cursor.execute(
+        """
+        SELECT dia, produto_id, categoria_id, receita, unidades, pedidos
+        FROM vendas_diarias
+        WHERE dia BETWEEN ? AND ?
+        """,
+        (_dia(inicio), _dia(fim))
+    ).fetchall()
+    vendas = pd.DataFrame.from_records(
+        linhas, columns=["dia", "produto_id", "categoria_id", "receita", "unidades", "pedidos"]
+    )
+    vendas["dia"] = pd.to_datetime(vendas["dia"])
+    vendas["categoria_id"] = vendas["categoria_id"].fillna(SEM_CATEGORIA)
+    return vendas.astype({
+        "produto_id": np.int64, "categoria_id": np.int64,
+        "receita": np.float64, "unidades": np.int64, "pedidos": np.int64,
+    })
+
+
+def _pedidos_por_dia(cursor, inicio, fim):
+    linhas = cursor.execute(
+        "SELECT dia, pedidos FROM pedidos_diarios WHERE dia BETWEEN ? AND ?",
+        (_dia(inicio), _dia(fim))
+    ).fetchall()
+    serie = pd.Series(
+        [l[1] for l in linhas], index=pd.to_datetime([l[0] for l in linhas]), dtype=np.int64
+    )
+    return serie.groupby(level=0).sum()
+
+
+def nomes(cursor, por, ids):
+    """Mapa id -> nome dos produtos ou categorias em ``ids`` (uma consulta)."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return {}
+    tabela = "produtos" if por == "produto" else "categorias"
+    marcadores = ",".join("?" * len(ids))
+    resultado = dict(cursor.execute(f"SELECT id, nome FROM {tabela} WHERE id IN ({marcadores})", ids))
+    if por == "categoria":
+        resultado[SEM_CATEGORIA] = "Sem categoria"
+    return resultado
+
+
+def serie_temporal(cursor, inicio, fim, metrica="receita", por=None, freq="D"):
+    """Série da ``metrica`` por período (``freq`` do pandas: D, W, MS...).
+
+    Sem ``por``, retorna uma ``Series``; com ``por``, um ``DataFrame`` com uma
+    coluna por produto/categoria. Dias sem vendas entram com zero. Pedidos no
+    total vêm de ``pedidos_diarios`` (um pedido com vários produtos conta uma vez).
+    """
+    dias = pd.date_range(_dia(inicio), _dia(fim), freq="D")
+    if por is None and metrica == "pedidos":
+        serie = _pedidos_por_dia(cursor, inicio, fim)
+    else:
+        vendas = carregar(cursor, inicio, fim)
+        if por is None:
+            serie = vendas.groupby("dia")[metrica].sum()
+        else:
+            serie = vendas.pivot_table(
+                index="dia", columns=AGRUPAMENTOS[por], values=metrica, aggfunc="sum", fill_value=0
+            )
+            serie = serie.rename(columns=nomes(cursor, por, serie.columns))
+    return serie.reindex(dias, fill_value=0).resample(freq).sum()
+
+
+def top_n(cursor, inicio, fim, n=10, por="produto", metrica="receita"):
+    """Os ``n`` produtos/categorias com maior ``metrica`` no período."""
+    vendas = carregar(cursor, inicio, fim)
+    totais = vendas.groupby(AGRUPAMENTOS[por])[list(METRICAS)].sum()
+    totais = totais.nlargest(n, metrica)
+    totais.insert(0, "nome", totais.index.map(nomes(cursor, por, totais.index)))
+    totais["participacao_pct"] = 100 * totais[metrica] / max(vendas[metrica].sum(), 1e-9)
+    return totais
+
+
+def comparar_periodos(cursor, inicio, fim, por="produto", metrica="receita"):
+    """``metrica`` no período contra o período anterior de mesma duração.
+
+    Retorna um ``DataFrame`` com ``atual``, ``anterior``, ``variacao`` e
+    ``variacao_pct`` (NaN quando não houve vendas no período anterior),
+    ordenado pela variação absoluta.
+    """
+    inicio, fim = pd.Timestamp(_dia(inicio)), pd.Timestamp(_dia(fim))
+    duracao = fim - inicio + pd.Timedelta(days=1)
+    inicio_anterior = inicio - duracao
+
+    # Uma leitura só cobrindo os dois períodos; o período de cada linha sai de uma máscara
+    vendas = carregar(cursor, inicio_anterior.date(), fim.date())
+    periodo = np.where(vendas["dia"].to_numpy() >= inicio.to_datetime64(), "atual", "anterior")
+    tabela = vendas.pivot_table(
+        index=AGRUPAMENTOS[por], columns=periodo, values=metrica, aggfunc="sum", fill_value=0
+    ).reindex(columns=["atual", "anterior"], fill_value=0)
+
+    tabela["variacao"] = tabela["atual"] - tabela["anterior"]
+    anterior = tabela["anterior"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tabela["variacao_pct"] = np.where(anterior > 0, 100 * tabela["variacao"] / anterior, np.nan)
+    tabela.insert(0, "nome", tabela.index.map(nomes(cursor, por, tabela.index)))
+    tabela.columns.name = None
+    return tabela.sort_values("variacao", key=np.abs, ascending=False)
+
+
+def linhas_exportacao(cursor, inicio, fim, tamanho_lote=TAMANHO_LOTE):
+    """Gera lotes de linhas ``COLUNAS_EXPORTACAO`` do rollup, sem carregar tudo."""
+    cursor.execute(
+        """
+        SELECT v.dia, v.produto_id, p.nome, COALESCE(c.nome, 'Sem categoria'),
+               v.receita, v.unidades, v.pedidos
+        FROM vendas_diarias v
+        LEFT JOIN produtos p ON p.id = v.produto_id
+        LEFT JOIN categorias c ON c.id = v.categoria_id
+        WHERE v.dia BETWEEN ? AND ?
+        ORDER BY v.dia, v.produto_id
+        """,
+        (_dia(inicio), _dia(fim))
+    )
+    while lote := cursor.fetchmany(tamanho_lote):
+        yield lote
+
+
+def exportar(cursor, arquivo, inicio, fim, formato=None, tamanho_lote=TAMANHO_LOTE):
+    """Exporta o rollup do período em CSV ou Parquet e retorna o número de linhas.
+
+    Escreve um lote por vez (um row group por lote no Parquet). Parquet
+    precisa do ``pyarrow``.
+    """
+    formato = formato or ("parquet" if str(arquivo).endswith(".parquet") else "csv")
+    total = 0
+    if formato == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Exportar em Parquet requer o pacote pyarrow (pip install pyarrow)")
+        esquema = pa.schema([
+            ("dia", pa.string()), ("produto_id", pa.int64()), ("produto", pa.string()),
+            ("categoria", pa.string()), ("receita", pa.float64()), ("unidades", pa.int64()),
+            ("pedidos", pa.int64()),
+        ])
+        with pq.ParquetWriter(arquivo, esquema) as escritor:
+            for lote in linhas_exportacao(cursor, inicio, fim, tamanho_lote):
+                colunas = list(zip(*lote))
+                escritor.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)],
+                    schema=esquema
+                ))
+                total += len(lote)
+    else:
+        with open(arquivo, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(COLUNAS_EXPORTACAO)
+            for lote in linhas_exportacao(cursor, inicio, fim, tamanho_lote):
+                escritor.writerows(lote)
+                total += len(lote)
+    return total
+
+
+if __name__ == "__main__":
+    padrao_inicio, padrao_fim = periodo_padrao()
+    parser = argparse.ArgumentParser(description="Relatórios de vendas a partir dos rollups diários.")
+    parser.add_argument("relatorio", choices=["serie", "top", "comparar", "exportar"])
+    parser.add_argument("arquivo", nargs="?", help="destino da exportação (.csv ou .parquet)")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--inicio", default=padrao_inicio.isoformat())
+    parser.add_argument("--fim", default=padrao_fim.isoformat())
+    parser.add_argument("--metrica", choices=METRICAS, default="receita")
+    parser.add_argument("--por", choices=list(AGRUPAMENTOS))
+    parser.add_argument("--freq", default="D")
+    parser.add_argument("--n", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = db.configurar(sqlite3.connect(args.db))
+    migracoes.migrar(conn)
+    cursor = conn.cursor()
+    try:
+        if args.relatorio == "serie":
+            print(serie_temporal(cursor, args.inicio, args.fim, args.metrica, args.por, args.freq).to_string())
+        elif args.relatorio == "top":
+            print(top_n(cursor, args.inicio, args.fim, args.n, args.por or "produto", args.metrica).to_string())
+        elif args.relatorio == "comparar":
+            print(comparar_periodos(cursor, args.inicio, args.fim, args.por or "produto", args.metrica).to_string())
+        else:
+            if not args.arquivo:
+                parser.error("informe o arquivo de destino")
+            total = exportar(cursor, args.arquivo, args.inicio, args.fim)
+            print(f"{total:,} linhas exportadas para {args.arquivo}", file=sys.stderr)
+    finally:
+        conn.close()